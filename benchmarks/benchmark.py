@@ -0,0 +1,290 @@
+#!/usr/bin/python3
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Benchmark the hot paths of gTranscribe on synthetic audio and transcripts.
+
+Results are printed as JSON, pass an earlier result with --compare to see
+how the median latencies changed:
+
+    ./benchmarks/benchmark.py -o new.json --compare old.json
+"""
+
+# pylint: disable=wrong-import-position
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+from typing import Any
+from collections.abc import Callable
+
+# Keep the meta data database and all caches out of the user's cache
+CACHE_DIR = tempfile.mkdtemp(prefix='gtranscribe-benchmark-')
+os.environ['XDG_CACHE_HOME'] = CACHE_DIR
+
+PROJECT_ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if PROJECT_ROOT_DIRECTORY not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT_DIRECTORY)
+
+import gi # NOQA: E402
+gi.require_version('Gst', '1.0')
+from gi.repository import GLib, Gst # NOQA: E402
+from gtranscribe.helpers import md5_of_file, ns_to_time, time_to_ns, trim # NOQA: E402
+from gtranscribe.fingerprint import sampled_fingerprint # NOQA: E402
+from gtranscribe.metadata import MetaData # NOQA: E402
+from gtranscribe.timestamps import TIMESTAMP_RE # NOQA: E402
+from gtranscribe.player import gTranscribePlayer, SEEK_INTERVAL # NOQA: E402
+
+# Encoders for the synthetic audio, formats whose elements are missing are
+# skipped
+FORMATS = {
+    'wav': 'wavenc',
+    'flac': 'flacenc',
+    'ogg': 'vorbisenc ! oggmux',
+    'mp3': 'lamemp3enc ! id3v2mux',
+}
+SAMPLE_RATE = 44100
+SAMPLES_PER_BUFFER = 1024
+
+
+def stats(samples: list[float], unit: str, **extra: Any) -> dict[str, Any]:
+    """Summarize the given measurements."""
+    result: dict[str, Any] = {'unit': unit, 'count': len(samples)}
+    if len(samples) > 1:
+        centiles = statistics.quantiles(samples, n=100, method='inclusive')
+        result['p50'] = centiles[49]
+        result['p95'] = centiles[94]
+    elif samples:
+        result['p50'] = result['p95'] = samples[0]
+    result.update(extra)
+    return result
+
+
+def measure(func: Callable[[], Any], repeat: int) -> list[float]:
+    """Run func repeatedly and return the duration of each call in ms."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def make_audio(directory: str, fmt: str, seconds: int) -> str | None:
+    """Encode a tone with some noise into a file of the given format."""
+    path = os.path.join(directory, f'{seconds}s.{fmt}')
+    buffers = seconds * SAMPLE_RATE // SAMPLES_PER_BUFFER
+    try:
+        pipeline = Gst.parse_launch(
+            f'audiotestsrc wave=ticks num-buffers={buffers} '
+            f'samplesperbuffer={SAMPLES_PER_BUFFER} ! '
+            f'audio/x-raw,rate={SAMPLE_RATE},channels=2 ! audioconvert ! '
+            f'{FORMATS[fmt]} ! filesink name=sink')
+    except GLib.Error:
+        return None
+    pipeline.get_by_name('sink').set_property('location', path)
+    pipeline.set_state(Gst.State.PLAYING)
+    message = pipeline.get_bus().timed_pop_filtered(
+        Gst.CLOCK_TIME_NONE, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    pipeline.set_state(Gst.State.NULL)
+    if message.type == Gst.MessageType.ERROR:
+        return None
+    return path
+
+
+def make_transcript(directory: str, lines: int) -> str:
+    """Write a transcript with a timestamp at the end of every line."""
+    path = os.path.join(directory, f'{lines}.txt')
+    words = ['well', 'I', 'think', 'that', 'the', 'interview', 'was', 'about',
+             'transcription', 'and', 'so', 'on']
+    rand = random.Random(lines)
+    with open(path, 'w', encoding='utf_8') as fout:
+        for i in range(lines):
+            stamp = trim(ns_to_time(i * 4000000000).strftime('%M:%S-%f'))
+            fout.write(' '.join(rand.choices(words, k=12)) + f' #{stamp}#\n')
+    return path
+
+
+def bench_hashing(files: dict[str, str]) -> dict[str, Any]:
+    results = {}
+    for name, path in files.items():
+        size = os.path.getsize(path)
+        for method, func in (('md5', md5_of_file), ('sampled', sampled_fingerprint)):
+            durations = measure(lambda f=func, p=path: f(p), 5)
+            results[f'{method}.{name}'] = stats(
+                durations, 'ms', bytes=size,
+                throughput_mb_s=size / 1e6 / (statistics.median(durations) / 1000))
+    return results
+
+
+def bench_helpers(repeat: int) -> dict[str, Any]:
+    """Time the conversions run on every UI tick, per batch of 1000 calls."""
+    rand = random.Random(0)
+    positions = [rand.randrange(0, 3 * 3600 * 10 ** 9) for _ in range(1000)]
+    times = [ns_to_time(position) for position in positions]
+
+    def format_positions() -> None:
+        for position in positions:
+            trim(ns_to_time(position).strftime('%H:%M:%S.%f'))
+
+    def convert_times() -> None:
+        for value in times:
+            time_to_ns(value)
+    return {
+        'format_position.1000': stats(measure(format_positions, repeat), 'ms'),
+        'time_to_ns.1000': stats(measure(convert_times, repeat), 'ms'),
+    }
+
+
+def bench_transcript(path: str, repeat: int) -> dict[str, Any]:
+    with open(path, encoding='utf_8') as fin:
+        text = fin.read()
+    durations = measure(lambda: sum(1 for _ in TIMESTAMP_RE.finditer(text)), repeat)
+    return {'timestamp_scan': stats(
+        durations, 'ms', bytes=len(text),
+        throughput_mb_s=len(text) / 1e6 / (statistics.median(durations) / 1000))}
+
+
+def bench_metadata(repeat: int) -> dict[str, Any]:
+    setup = MetaData('', '')
+    setup.init_db()
+    keys = [f'benchmark-{i}' for i in range(repeat)]
+    for key in keys:
+        MetaData('', key).store_md5()
+
+    def write() -> None:
+        for i, key in enumerate(keys):
+            MetaData('', key).position = i
+        MetaData.flush()
+
+    def read() -> None:
+        for key in keys:
+            _ = MetaData('', key).position
+    return {
+        f'write_flush.{repeat}': stats(measure(write, 10), 'ms'),
+        f'read_uncached.{repeat}': stats(measure(read, 10), 'ms'),
+    }
+
+
+def bench_player(files: dict[str, str], repeat: int) -> dict[str, Any]:
+    """Time prerolling a file and seeks until the pipeline is prerolled again."""
+    results = {}
+    context = GLib.MainContext.default()
+    player = gTranscribePlayer()
+    for name, path in files.items():
+        opens = []
+        for _ in range(3):
+            start = time.perf_counter()
+            player.open(path)
+            if not player.wait():
+                break
+            opens.append((time.perf_counter() - start) * 1000)
+        if not opens:
+            continue
+        results[f'open.{name}'] = stats(opens, 'ms')
+        length = player.duration
+        rand = random.Random(1)
+        for accurate in (True, False):
+            seeks = []
+            for _ in range(repeat):
+                # Let the coalescing interval of the previous seek pass
+                time.sleep(SEEK_INTERVAL / 1000)
+                while context.iteration(False):
+                    pass
+                start = time.perf_counter()
+                player.seek(rand.randrange(0, length), accurate)
+                player.wait()
+                seeks.append((time.perf_counter() - start) * 1000)
+            kind = 'accurate' if accurate else 'keyframe'
+            results[f'seek_{kind}.{name}'] = stats(seeks, 'ms')
+    player.pipeline.set_state(Gst.State.NULL)
+    return results
+
+
+def compare(old: dict[str, Any], new: dict[str, Any]) -> None:
+    """Print how the median of each benchmark changed."""
+    for group, benchmarks in new['results'].items():
+        for name, result in benchmarks.items():
+            before = old.get('results', {}).get(group, {}).get(name)
+            if before is None or not before.get('p50') or 'p50' not in result:
+                continue
+            change = (result['p50'] / before['p50'] - 1) * 100
+            print(f'{group}.{name}: {before["p50"]:.3f} -> {result["p50"]:.3f} '
+                  f'{result["unit"]} ({change:+.1f}%)', file=sys.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-o', '--output', help='write the results to this file')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare with the results in this file')
+    parser.add_argument('--quick', action='store_true',
+                        help='use small files and few repetitions')
+    args = parser.parse_args()
+
+    Gst.init(None)
+    seconds = (10, 60) if args.quick else (60, 600)
+    repeat = 20 if args.quick else 100
+    data_dir = os.path.join(CACHE_DIR, 'data')
+    os.makedirs(data_dir)
+    files = {}
+    for fmt in FORMATS:
+        for length in seconds:
+            path = make_audio(data_dir, fmt, length)
+            if path is None:
+                print(f'Skipping {fmt}, encoder not available', file=sys.stderr)
+                break
+            files[f'{fmt}.{length}s'] = path
+    transcript = make_transcript(data_dir, 5000 if args.quick else 50000)
+
+    results = {
+        'hashing': bench_hashing(files),
+        'helpers': bench_helpers(repeat),
+        'transcript': bench_transcript(transcript, repeat),
+        'metadata': bench_metadata(repeat * 10),
+        'player': bench_player(files, repeat),
+    }
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'gstreamer': Gst.version_string(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf_8') as fout:
+            fout.write(output + '\n')
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare, encoding='utf_8') as fin:
+            compare(json.load(fin), report)
+    MetaData.close()
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    finally:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
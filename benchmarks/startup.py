@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Benchmark the time from starting gTranscribe to its first frame.
+
+gTranscribe is started repeatedly with GTRANSCRIBE_STARTUP_BENCHMARK set, it
+then reports the time to its first frame and quits. Needs a display.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import statistics
+import subprocess
+import tempfile
+from typing import Any
+
+PROJECT_ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+PREFIX = 'first-frame-ms: '
+
+
+def run_once(env: dict[str, str]) -> tuple[float, float] | None:
+    """Start gTranscribe and return the first frame and total time in ms."""
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, os.path.join(PROJECT_ROOT_DIRECTORY, 'bin', 'gtranscribe')],
+        env=env, capture_output=True, text=True, timeout=60, check=False)
+    total = (time.perf_counter() - start) * 1000
+    for line in process.stdout.splitlines():
+        if line.startswith(PREFIX):
+            return float(line[len(PREFIX):]), total
+    print(process.stderr, file=sys.stderr)
+    return None
+
+
+def summarize(samples: list[float]) -> dict[str, Any]:
+    centiles = statistics.quantiles(samples, n=100, method='inclusive')
+    return {'unit': 'ms', 'count': len(samples), 'p50': centiles[49],
+            'p95': centiles[94]}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--runs', type=int, default=20,
+                        help='number of starts, the first one is not counted')
+    parser.add_argument('--target', type=float, default=500,
+                        help='fail if the median time to the first frame '
+                        'exceeds this many ms')
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix='gtranscribe-startup-')
+    env = dict(os.environ, XDG_CACHE_HOME=cache_dir,
+               GTRANSCRIBE_STARTUP_BENCHMARK='1')
+    first_frame = []
+    total = []
+    try:
+        # The first start fills the caches of the system and is not counted
+        for i in range(args.runs + 1):
+            result = run_once(env)
+            if result is None:
+                print('gTranscribe did not report its startup time', file=sys.stderr)
+                return 1
+            if i > 0:
+                first_frame.append(result[0])
+                total.append(result[1])
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    report = {
+        'first_frame': summarize(first_frame),
+        'process': summarize(total),
+        'target_ms': args.target,
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if report['first_frame']['p50'] <= args.target else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
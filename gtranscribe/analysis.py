@@ -0,0 +1,106 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Compute the waveform and the utterances of audio files."""
+
+import logging
+import threading
+from array import array
+from gi.repository import GLib, GObject, Gio
+from gtranscribe.player import decode_pcm
+from gtranscribe.speech import FRAME_NS, Speech
+from gtranscribe.waveform import SAMPLE_RATE, Waveform
+logger = logging.getLogger('analysis')
+
+
+class AudioAnalyzer(GObject.Object):
+    """
+    Load the waveform and the utterances of an audio file in a worker thread.
+
+    Cached results are used if available. Anything missing is computed from
+    a single decoding pass and stored. 'waveform' and 'speech' are emitted
+    on the main loop. Starting a new analysis cancels the previous one.
+    """
+
+    __gtype_name__ = 'gTranscribeAudioAnalyzer'
+
+    __gsignals__ = {
+        'waveform': (GObject.SignalFlags.RUN_LAST, None,
+                     (GObject.TYPE_STRING, GObject.TYPE_PYOBJECT)),
+        'speech': (GObject.SignalFlags.RUN_LAST, None,
+                   (GObject.TYPE_STRING, GObject.TYPE_PYOBJECT))
+    }
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._cancellable: Gio.Cancellable | None = None
+
+    def analyze(self, filepath: str, fingerprint: str) -> None:
+        """Start analyzing the given file."""
+        self.cancel()
+        cancellable = Gio.Cancellable()
+        self._cancellable = cancellable
+        thread = threading.Thread(target=self._run,
+                                  args=(filepath, fingerprint, cancellable),
+                                  name='gTranscribe analysis', daemon=True)
+        thread.start()
+
+    def cancel(self) -> None:
+        """Cancel the running analysis, if any."""
+        if self._cancellable is not None:
+            self._cancellable.cancel()
+            self._cancellable = None
+
+    def _run(self, filepath: str, fingerprint: str,
+             cancellable: Gio.Cancellable) -> None:
+        """Worker thread: load or compute the waveform and the utterances."""
+        waveform = Waveform.load(fingerprint)
+        if waveform is not None:
+            GLib.idle_add(self._emit, cancellable, 'waveform', filepath, waveform)
+        speech = Speech.load(fingerprint)
+        if speech is not None:
+            GLib.idle_add(self._emit, cancellable, 'speech', filepath, speech)
+            if waveform is not None:
+                return
+        logger.debug('Analyzing "%s"', filepath)
+        energies = array('f') if speech is None else None
+        chunks = decode_pcm(filepath, SAMPLE_RATE, cancellable, energies, FRAME_NS)
+        try:
+            if waveform is None:
+                waveform = Waveform.compute(chunks)
+                try:
+                    waveform.save(fingerprint)
+                except OSError as e:
+                    logger.warning('Could not store waveform: %s', e)
+                GLib.idle_add(self._emit, cancellable, 'waveform', filepath, waveform)
+            else:
+                # Only the energies are needed
+                for _ in chunks:
+                    pass
+        except GLib.Error as error:
+            logger.debug('Analysis stopped: %s', error.message)
+            return
+        if energies is not None:
+            speech = Speech.analyze(energies)
+            speech.save(fingerprint)
+            logger.debug('Found %d utterances in "%s"', len(speech), filepath)
+            GLib.idle_add(self._emit, cancellable, 'speech', filepath, speech)
+
+    def _emit(self, cancellable: Gio.Cancellable, signal: str, filepath: str,
+              result: object) -> bool:
+        """Emit a signal on the main loop unless the analysis was cancelled."""
+        if not cancellable.is_cancelled():
+            self.emit(signal, filepath, result)
+        return False
@@ -0,0 +1,205 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Process many recordings and transcripts without the GUI."""
+
+import os
+import re
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import multiprocessing
+from gettext import gettext as _
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple
+from collections.abc import Callable
+from gtranscribe.helpers import ns_to_time, trim
+from gtranscribe.timestamps import TIMESTAMP_RE, parse_timestamp
+logger = logging.getLogger('batch')
+
+
+class Result(NamedTuple):
+    """Outcome of processing one file."""
+
+    path: str
+    size: int
+    ok: bool
+    message: str
+
+
+def _fingerprint(path: str) -> Result:
+    """Fingerprint an audio file and make sure it has a meta data entry."""
+    # pylint: disable=import-outside-toplevel
+    from gtranscribe.fingerprint import fingerprint_of_file
+    from gtranscribe.metadata import MetaData
+    MetaData(path, '').init_db()
+    meta = MetaData(path, fingerprint_of_file(path))
+    meta.store_md5(accessed=False)
+    return Result(path, os.path.getsize(path), True, meta.md5)
+
+
+def _migrate(path: str) -> Result:
+    """Move meta data stored under the md5 hash of an audio file."""
+    # pylint: disable=import-outside-toplevel
+    from gtranscribe.fingerprint import fingerprint_of_file, migrate_legacy
+    from gtranscribe.metadata import MetaData
+    MetaData(path, '').init_db()
+    fingerprint = fingerprint_of_file(path)
+    migrate_legacy(path, fingerprint)
+    return Result(path, os.path.getsize(path), True, fingerprint)
+
+
+def _format_tag(ns: int) -> str:
+    """Format nanoseconds as [HH:MM:SS.F] tag."""
+    return '[' + trim(ns_to_time(ns).strftime('%H:%M:%S.%f')) + ']'
+
+
+def _normalize(path: str) -> Result:
+    """Rewrite all timestamp tags of a transcript as [HH:MM:SS.F]."""
+    with open(path, encoding="utf_8") as fin:
+        text = fin.read()
+    count = 0
+
+    def replace(match: 're.Match[str]') -> str:
+        nonlocal count
+        tag = _format_tag(parse_timestamp(match.group(1)))
+        if tag != match.group(0):
+            count += 1
+        return tag
+    text = TIMESTAMP_RE.sub(replace, text)
+    if count:
+        _replace_file(path, text)
+    return Result(path, os.path.getsize(path), True,
+                  _('%d tags changed') % count)
+
+
+def _replace_file(path: str, text: str) -> None:
+    """Atomically replace the contents of a text file."""
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=f'.{name}.', dir=directory)
+    try:
+        with os.fdopen(fd, mode="w", encoding="utf_8") as fout:
+            fout.write(text)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.chmod(tmp, os.stat(path).st_mode)
+        os.replace(tmp, path)
+    except OSError:
+        os.unlink(tmp)
+        raise
+
+
+def _audio_duration(path: str) -> int:
+    """Return the duration of an audio file in nanoseconds."""
+    # pylint: disable=import-outside-toplevel
+    # The playlist requires the GStreamer versions
+    from gtranscribe.playlist import PROBE_TIMEOUT, init_gstreamer
+    from gi.repository import GLib, Gst, GstPbutils
+    init_gstreamer()
+    discoverer = GstPbutils.Discoverer.new(PROBE_TIMEOUT)
+    try:
+        info = discoverer.discover_uri(Gst.filename_to_uri(os.path.abspath(path)))
+    except GLib.Error as error:
+        raise OSError(_('Could not open audio file %s') % path) from error
+    return int(info.get_duration())
+
+
+def _validate(pair: str) -> Result:
+    """Check that the tags of a transcript are ordered and within the audio."""
+    audio, transcript = pair.split('\0')
+    length = _audio_duration(audio)
+    with open(transcript, encoding="utf_8") as fin:
+        text = fin.read()
+    problems = []
+    previous = 0
+    for match in TIMESTAMP_RE.finditer(text):
+        value = parse_timestamp(match.group(1))
+        line = text.count('\n', 0, match.start()) + 1
+        if value > length:
+            problems.append(_('line %d: %s is after the end') % (line, match.group(0)))
+        if value < previous:
+            problems.append(_('line %d: %s is out of order') % (line, match.group(0)))
+        previous = max(previous, value)
+    size = os.path.getsize(audio) + os.path.getsize(transcript)
+    if problems:
+        return Result(transcript, size, False, '; '.join(problems))
+    return Result(transcript, size, True, _('OK'))
+
+
+COMMANDS: dict[str, Callable[[str], Result]] = {
+    'fingerprint': _fingerprint,
+    'migrate': _migrate,
+    'normalize': _normalize,
+    'validate': _validate,
+}
+
+
+def _run(command: str, item: str) -> Result:
+    """Worker process: run a command on one item and catch its errors."""
+    try:
+        return COMMANDS[command](item)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        return Result(item.split('\0')[-1], 0, False, str(e))
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Parse the command line, process all files and print a summary."""
+    parser = argparse.ArgumentParser(
+        prog='gtranscribe-batch',
+        description=_("Process recordings and transcripts without the GUI"))
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help=_("Show debug messages"))
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help=_("Number of worker processes"))
+    parser.add_argument("command", choices=sorted(COMMANDS),
+                        help=_("fingerprint or migrate audio files, normalize "
+                               "the tags of transcripts or validate pairs of "
+                               "audio file and transcript"))
+    parser.add_argument("files", nargs='+', metavar='FILE')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format='%(asctime)s %(name)s: %(message)s',
+                        level=logging.DEBUG if args.verbose else logging.WARNING)
+    items = args.files
+    if args.command == 'validate':
+        if len(items) % 2:
+            parser.error(_("validate expects pairs of audio file and transcript"))
+        items = [a + '\0' + t for a, t in zip(items[::2], items[1::2])]
+
+    start = time.monotonic()
+    failed = 0
+    total_size = 0
+    # spawn, as GStreamer and GLib don't survive a fork
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs),
+                             mp_context=context) as pool:
+        futures = [pool.submit(_run, args.command, item) for item in items]
+        for future in as_completed(futures):
+            result = future.result()
+            total_size += result.size
+            if result.ok:
+                print(f'{result.path}: {result.message}')
+            else:
+                failed += 1
+                print(f'{result.path}: {_("error")}: {result.message}',
+                      file=sys.stderr)
+    elapsed = max(time.monotonic() - start, 1e-9)
+    print(_('%d files, %d failed, %.1f MB in %.2f s (%.1f files/s, %.1f MB/s)')
+          % (len(items), failed, total_size / 1e6, elapsed,
+             len(items) / elapsed, total_size / 1e6 / elapsed),
+          file=sys.stderr)
+    return 1 if failed else 0
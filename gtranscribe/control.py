@@ -0,0 +1,303 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Control gTranscribe through a local socket, e.g. from foot pedals.
+
+Clients send one command per line and get one line of JSON back:
+
+    play | pause | toggle
+    seek SECONDS      absolute, or relative with a leading + or -
+    rate SPEED        absolute, or relative with a leading + or -
+    timestamp         insert a timestamp at the cursor
+    state             position, duration, speed etc. of the current file
+"""
+
+import os
+import json
+import math
+import logging
+from collections import deque
+from typing import Any, Dict
+from gi.repository import GLib, Gio
+from gtranscribe import tracing
+logger = logging.getLogger('control')
+
+# Relative seeks arriving within this many ms after the last one are summed
+# up and run as a single seek once the interval passed
+COALESCE_INTERVAL = 60
+# Longest command line accepted, longer ones are dropped while reading
+MAX_LINE = 256
+# Replies waiting to be sent to a client before further ones are dropped,
+# e.g. for clients which never read them
+MAX_PENDING_REPLIES = 16
+
+
+class _Client():
+    """State of a connection to the control socket."""
+
+    def __init__(self, connection: Gio.SocketConnection) -> None:
+        self.connection = connection
+        self.input = connection.get_input_stream()
+        self.output = connection.get_output_stream()
+        self.buffer = bytearray()
+        # The current line is too long and dropped up to its end
+        self.discarding = False
+        self.replies: deque[bytes] = deque()
+        self.writing = False
+
+
+def socket_path() -> str:
+    """Return the path of the control socket."""
+    return os.path.join(GLib.get_user_runtime_dir(), 'gtranscribe', 'control.sock')
+
+
+class CommandError(Exception):
+    """A command could not be run, the message is sent to the client."""
+
+
+class ControlServer():
+    """Accept commands on the control socket and run them on the main loop."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+        self._service: Gio.SocketService | None = None
+        self._clients: set[_Client] = set()
+        # Relative seek waiting for the running COALESCE_INTERVAL to pass
+        self._pending_offset = 0
+        self._seek_id: int | None = None
+
+    def start(self) -> bool:
+        """Listen on the control socket."""
+        path = socket_path()
+        try:
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            # The socket of a crashed instance is left behind
+            if os.path.exists(path):
+                os.unlink(path)
+            service = Gio.SocketService()
+            service.add_address(Gio.UnixSocketAddress.new(path),
+                                Gio.SocketType.STREAM, Gio.SocketProtocol.DEFAULT,
+                                None)
+        except (GLib.Error, OSError) as e:
+            logger.debug("Couldn't listen on control socket: %s", e)
+            return False
+        service.connect('incoming', self.on_incoming)
+        service.start()
+        self._service = service
+        logger.debug('Listening on "%s"', path)
+        return False
+
+    def stop(self) -> None:
+        """Close the control socket and all connections."""
+        if self._seek_id is not None:
+            GLib.source_remove(self._seek_id)
+            self._seek_id = None
+        if self._service is None:
+            return
+        self._service.stop()
+        self._service.close()
+        self._service = None
+        for client in list(self._clients):
+            self._close(client)
+        try:
+            os.unlink(socket_path())
+        except OSError:
+            pass
+
+    # pylint: disable=unused-argument
+    def on_incoming(self, service: Gio.SocketService, connection: Gio.SocketConnection,
+                    source: Any) -> bool:
+        client = _Client(connection)
+        self._clients.add(client)
+        self._read(client)
+        return True
+
+    def _read(self, client: _Client) -> None:
+        client.input.read_bytes_async(MAX_LINE + 1, GLib.PRIORITY_DEFAULT, None,
+                                      self._on_read, client)
+
+    def _on_read(self, stream: Gio.InputStream, result: Gio.AsyncResult,
+                 client: _Client) -> None:
+        if client not in self._clients:
+            return
+        try:
+            data = stream.read_bytes_finish(result).get_data()
+        except GLib.Error as e:
+            logger.debug('Reading command failed: %s', e.message)
+            self._close(client)
+            return
+        if not data:
+            self._close(client)
+            return
+        client.buffer += data.replace(b'\r', b'\n')
+        while True:
+            end = client.buffer.find(b'\n')
+            if end < 0:
+                break
+            line = bytes(client.buffer[:end])
+            del client.buffer[:end + 1]
+            if client.discarding:
+                client.discarding = False
+            elif line:
+                self._handle(client, line)
+        # Only up to MAX_LINE bytes of a line are kept in memory
+        if len(client.buffer) > MAX_LINE:
+            client.buffer.clear()
+            if not client.discarding:
+                client.discarding = True
+                self._reply(client, {'ok': False, 'error': 'command too long'})
+        if client in self._clients:
+            self._read(client)
+
+    def _handle(self, client: _Client, line: bytes) -> None:
+        try:
+            command = line.decode('utf_8')
+        except UnicodeDecodeError:
+            self._reply(client, {'ok': False, 'error': 'invalid UTF-8'})
+            return
+        self._reply(client, self.execute(command))
+
+    def _reply(self, client: _Client, reply: Dict[str, Any]) -> None:
+        """Send a reply without blocking, drop it if the client doesn't read."""
+        if len(client.replies) >= MAX_PENDING_REPLIES:
+            tracing.count('control.replies.dropped')
+            return
+        client.replies.append((json.dumps(reply) + '\n').encode('utf_8'))
+        self._write_next(client)
+
+    def _write_next(self, client: _Client) -> None:
+        if client.writing or not client.replies:
+            return
+        client.writing = True
+        client.output.write_all_async(client.replies.popleft(), GLib.PRIORITY_DEFAULT,
+                                      None, self._on_written, client)
+
+    def _on_written(self, stream: Gio.OutputStream, result: Gio.AsyncResult,
+                    client: _Client) -> None:
+        client.writing = False
+        try:
+            stream.write_all_finish(result)
+        except GLib.Error as e:
+            logger.debug('Sending reply failed: %s', e.message)
+            self._close(client)
+            return
+        if client in self._clients:
+            self._write_next(client)
+
+    def _close(self, client: _Client) -> None:
+        self._clients.discard(client)
+        try:
+            client.connection.close(None)
+        except GLib.Error:
+            pass
+
+    def execute(self, line: str) -> Dict[str, Any]:
+        """Run a command and return the reply."""
+        words = line.split()
+        if not words:
+            return {'ok': False, 'error': 'empty command'}
+        command, args = words[0].lower(), words[1:]
+        logger.debug('Control: %s', line)
+        tracing.count('control.commands')
+        try:
+            if command == 'state':
+                return {'ok': True, 'state': self.state()}
+            if not self.app.slider.is_sensitive():
+                raise CommandError('no file loaded')
+            if command == 'play':
+                self.app.play_action.set_active(True)
+            elif command == 'pause':
+                self.app.play_action.set_active(False)
+            elif command == 'toggle':
+                self.app.play_action.set_active(not self.app.play_action.get_active())
+            elif command == 'seek':
+                value, relative = self._argument(args)
+                if relative:
+                    self._seek_relative(int(value * 1e9))
+                else:
+                    self._cancel_seek()
+                    self.app.set_position(max(0, int(value * 1e9)))
+            elif command == 'rate':
+                value, relative = self._argument(args)
+                if relative:
+                    value += self.app.speedscale.get_value()
+                self.app.speedscale.set_value(value)
+            elif command == 'timestamp':
+                self.app.insert_timestamp(newline=False)
+            else:
+                raise CommandError(f'unknown command "{command}"')
+        except CommandError as e:
+            return {'ok': False, 'error': str(e)}
+        return {'ok': True}
+
+    @staticmethod
+    def _argument(args: list[str]) -> tuple[float, bool]:
+        """Return the numeric argument and whether it is relative."""
+        if len(args) != 1:
+            raise CommandError('expected one argument')
+        try:
+            value = float(args[0])
+        except ValueError as e:
+            raise CommandError(f'invalid number "{args[0]}"') from e
+        if not math.isfinite(value):
+            raise CommandError(f'invalid number "{args[0]}"')
+        return value, args[0][0] in '+-'
+
+    def state(self) -> Dict[str, Any]:
+        """Return the state of the player in seconds."""
+        if self.app.md5 is None:
+            return {'file': None}
+        position = self.app.player.position
+        return {
+            'file': self.app.player.filename,
+            'position': (position or 0) / 1e9,
+            'duration': self.app.player.duration / 1e9,
+            'rate': self.app.speedscale.get_value(),
+            'volume': self.app.volumebutton.get_value(),
+            'playing': self.app.play_action.get_active(),
+        }
+
+    def _seek_relative(self, amount: int) -> None:
+        """
+        Move the position, coalescing bursts.
+
+        The first seek of a burst, e.g. from a pedal held down, runs at once,
+        later ones are summed up until COALESCE_INTERVAL passed without one.
+        """
+        if self._seek_id is not None:
+            if self._pending_offset:
+                tracing.count('control.seek.coalesced')
+            self._pending_offset += amount
+            return
+        self.app.move_position(amount)
+        self._seek_id = GLib.timeout_add(COALESCE_INTERVAL, self._on_seek_timeout)
+
+    def _on_seek_timeout(self) -> bool:
+        """Run the sum of the seeks requested during the interval, if any."""
+        if not self._pending_offset:
+            self._seek_id = None
+            return False
+        amount = self._pending_offset
+        self._pending_offset = 0
+        self.app.move_position(amount)
+        return True
+
+    def _cancel_seek(self) -> None:
+        """Drop the pending relative seek, an absolute one overrides it."""
+        if self._seek_id is not None:
+            GLib.source_remove(self._seek_id)
+            self._seek_id = None
+        self._pending_offset = 0
@@ -0,0 +1,256 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Export the passages of a transcript as audio clips."""
+
+# pylint: disable=wrong-import-position
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import GLib, GObject, Gio, Gst # NOQA: E402
+from gtranscribe import tracing # NOQA: E402
+from gtranscribe.player import init_gstreamer # NOQA: E402
+logger = logging.getLogger('export')
+
+# Nanoseconds to wait for a pipeline to preroll
+PREROLL_TIMEOUT = 10 * Gst.SECOND
+# Clips of formats without passthrough support are encoded with this
+ENCODER = ('audioconvert ! flacenc', 'flac')
+
+
+class Clip(NamedTuple):
+    """A passage to export, positions in ns."""
+
+    start: int
+    end: int
+    target: str
+
+
+def passages(stamps: list[int], duration: int) -> list[tuple[int, int]]:
+    """
+    Return start and end of the passages marked by the given timestamps.
+
+    A timestamp marks the end of its passage, the first one starts at the
+    beginning of the recording.
+    """
+    bounds = sorted({stamp for stamp in stamps if 0 < stamp <= duration})
+    return list(zip([0] + bounds, bounds))
+
+
+def passthrough_for(caps: Gst.Caps) -> tuple[str, str] | None:
+    """
+    Return the muxer and file extension to store parsed, undecoded data.
+
+    None means the format can't be cut without decoding it.
+    """
+    structure = caps.get_structure(0)
+    name = structure.get_name()
+    if name == 'audio/x-raw':
+        return 'wavenc', 'wav'
+    if name == 'audio/mpeg':
+        version = structure.get_value('mpegversion')
+        if version == 1:
+            # MPEG audio frames need no container
+            return '', 'mp3'
+        if version in (2, 4) and structure.get_value('stream-format') == 'raw':
+            return 'mp4mux', 'm4a'
+    return None
+
+
+def probe(filepath: str) -> Gst.Caps | None:
+    """Return the caps of the parsed audio stream of a file."""
+    init_gstreamer()
+    pipeline = Gst.parse_launch('filesrc name=src ! parsebin ! fakesink name=sink')
+    pipeline.get_by_name('src').set_property('location', filepath)
+    pipeline.set_state(Gst.State.PAUSED)
+    try:
+        if pipeline.get_state(PREROLL_TIMEOUT)[0] != Gst.StateChangeReturn.SUCCESS:
+            return None
+        return pipeline.get_by_name('sink').get_static_pad('sink').get_current_caps()
+    finally:
+        pipeline.set_state(Gst.State.NULL)
+
+
+def _wait(pipeline: Gst.Pipeline, cancellable: Gio.Cancellable | None) -> None:
+    """Block until the pipeline is done, raise GLib.Error on failure."""
+    bus = pipeline.get_bus()
+    while True:
+        if cancellable is not None:
+            cancellable.set_error_if_cancelled()
+        message = bus.timed_pop_filtered(
+            100 * Gst.MSECOND, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+        if message is None:
+            continue
+        if message.type == Gst.MessageType.ERROR:
+            raise message.parse_error()[0]
+        return
+
+
+def export_clip(filepath: str, clip: Clip, muxer: str | None,
+                cancellable: Gio.Cancellable | None = None) -> int:
+    """
+    Cut a clip from an audio file.
+
+    The source is read up to the clip by a seek and the data is handed to a
+    second pipeline writing the clip, so the writer only ever sees the clip.
+    With a 'muxer' the parsed data is stored without decoding, otherwise
+    it is decoded and encoded with ENCODER. This blocks, so run it in a
+    worker thread. Raises GLib.Error on failure or once cancelled.
+
+    :Return:
+        - The size of the clip in bytes.
+    """
+    init_gstreamer()
+    if muxer is not None:
+        reader = Gst.parse_launch(
+            'filesrc name=src ! parsebin ! appsink name=sink sync=false')
+        writer_elements = [muxer] if muxer else []
+    else:
+        reader = Gst.parse_launch(
+            'filesrc name=src ! decodebin ! audioconvert ! '
+            'appsink name=sink sync=false caps=audio/x-raw')
+        writer_elements = [ENCODER[0]]
+    writer = Gst.parse_launch(' ! '.join(
+        ['appsrc name=src format=time'] + writer_elements + ['filesink name=sink']))
+    reader.get_by_name('src').set_property('location', filepath)
+    writer.get_by_name('sink').set_property('location', clip.target)
+    sink = reader.get_by_name('sink')
+    src = writer.get_by_name('src')
+    try:
+        reader.set_state(Gst.State.PAUSED)
+        if reader.get_state(PREROLL_TIMEOUT)[0] != Gst.StateChangeReturn.SUCCESS:
+            raise GLib.Error(f'Could not read "{filepath}"')
+        reader.seek(1.0, Gst.Format.TIME,
+                    Gst.SeekFlags.FLUSH | Gst.SeekFlags.ACCURATE,
+                    Gst.SeekType.SET, clip.start, Gst.SeekType.SET, clip.end)
+        reader.set_state(Gst.State.PLAYING)
+        first_pts = None
+        while True:
+            if cancellable is not None:
+                cancellable.set_error_if_cancelled()
+            message = reader.get_bus().pop_filtered(Gst.MessageType.ERROR)
+            if message is not None:
+                raise message.parse_error()[0]
+            sample = sink.emit('try-pull-sample', Gst.SECOND)
+            if sample is None:
+                if sink.get_property('eos'):
+                    break
+                continue
+            buf = sample.get_buffer()
+            if first_pts is None:
+                # The clip starts at 0
+                first_pts = buf.pts if buf.pts != Gst.CLOCK_TIME_NONE else clip.start
+                src.set_property('caps', sample.get_caps())
+                writer.set_state(Gst.State.PLAYING)
+            buf = buf.copy()
+            if buf.pts != Gst.CLOCK_TIME_NONE:
+                buf.pts = max(buf.pts - first_pts, 0)
+            buf.dts = Gst.CLOCK_TIME_NONE
+            src.emit('push-buffer', buf)
+        if first_pts is None:
+            raise GLib.Error(f'Nothing to export from {clip.start} to {clip.end}')
+        src.emit('end-of-stream')
+        _wait(writer, cancellable)
+    finally:
+        reader.set_state(Gst.State.NULL)
+        writer.set_state(Gst.State.NULL)
+    return os.path.getsize(clip.target)
+
+
+class ClipExporter(GObject.Object):
+    """
+    Export clips with a pool of worker threads.
+
+    Each worker runs its own pipelines. 'progress' is emitted on the main
+    loop with the number of clips done, the total and the throughput as
+    seconds of audio exported per second. 'finished' is emitted with the
+    number of exported and failed clips. Starting a new export cancels the
+    previous one.
+    """
+
+    __gtype_name__ = 'gTranscribeClipExporter'
+
+    __gsignals__ = {
+        'progress': (GObject.SignalFlags.RUN_LAST, None,
+                     (GObject.TYPE_INT, GObject.TYPE_INT, GObject.TYPE_DOUBLE)),
+        'finished': (GObject.SignalFlags.RUN_LAST, None,
+                     (GObject.TYPE_INT, GObject.TYPE_INT))
+    }
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._cancellable: Gio.Cancellable | None = None
+
+    def export(self, filepath: str, ranges: list[tuple[int, int]], directory: str,
+               jobs: int | None = None) -> None:
+        """Start exporting the given ranges of a file into 'directory'."""
+        self.cancel()
+        cancellable = Gio.Cancellable()
+        self._cancellable = cancellable
+        thread = threading.Thread(target=self._run,
+                                  args=(filepath, ranges, directory,
+                                        jobs or os.cpu_count() or 1, cancellable),
+                                  name='gTranscribe export', daemon=True)
+        thread.start()
+
+    def cancel(self) -> None:
+        """Cancel the running export, if any."""
+        if self._cancellable is not None:
+            self._cancellable.cancel()
+            self._cancellable = None
+
+    def _run(self, filepath: str, ranges: list[tuple[int, int]], directory: str,
+             jobs: int, cancellable: Gio.Cancellable) -> None:
+        """Coordinator thread: run the clips in the pool and report progress."""
+        start_time = time.perf_counter()
+        caps = probe(filepath)
+        passthrough = passthrough_for(caps) if caps is not None else None
+        muxer, extension = passthrough if passthrough is not None else (None, ENCODER[1])
+        logger.debug('Exporting %d clips of "%s" %s', len(ranges), filepath,
+                     'without re-encoding' if muxer is not None else 'with re-encoding')
+        stem = os.path.splitext(os.path.basename(filepath))[0]
+        clips = [Clip(start, end, os.path.join(directory, f'{stem}-{i:03d}.{extension}'))
+                 for i, (start, end) in enumerate(ranges, 1)]
+        done = failed = 0
+        exported = 0
+        with tracing.span('export', clips=len(clips), jobs=jobs), \
+                ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(export_clip, filepath, clip, muxer, cancellable): clip
+                       for clip in clips}
+            for future in as_completed(futures):
+                clip = futures[future]
+                try:
+                    future.result()
+                    done += 1
+                    exported += clip.end - clip.start
+                except (GLib.Error, OSError) as error:
+                    failed += 1
+                    logger.debug('Exporting "%s" failed: %s', clip.target, error)
+                elapsed = time.perf_counter() - start_time
+                GLib.idle_add(self._emit, cancellable, 'progress', done + failed,
+                              len(clips), exported / Gst.SECOND / elapsed)
+        logger.debug('Exported %d clips in %.1f s', done, time.perf_counter() - start_time)
+        GLib.idle_add(self._emit, cancellable, 'finished', done, failed)
+
+    def _emit(self, cancellable: Gio.Cancellable, signal: str, *args: object) -> bool:
+        """Emit a signal on the main loop unless the export was cancelled."""
+        if not cancellable.is_cancelled():
+            self.emit(signal, *args)
+        return False
@@ -0,0 +1,150 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Fast content fingerprints used as keys for the meta data database."""
+
+import os
+import logging
+from hashlib import blake2b
+from typing import Any, Dict
+from collections.abc import Callable
+from gtranscribe.helpers import md5_of_file
+from gtranscribe.metadata import transaction
+from gtranscribe import tracing
+logger = logging.getLogger('fingerprint')
+
+# Size of each block read by the sampled fingerprint
+SAMPLE_SIZE = 65536
+
+DEFAULT_METHOD = 'sampled'
+
+# Fingerprint functions take the filename and optionally a Gio.Cancellable
+# and a progress callback as keyword arguments 'cancellable' and 'progress'.
+Fingerprinter = Callable[..., str]
+
+fingerprinters: Dict[str, Fingerprinter] = {}
+
+
+def register(name: str) -> Callable[[Fingerprinter], Fingerprinter]:
+    """Register a fingerprint function under the given name."""
+    def decorator(func: Fingerprinter) -> Fingerprinter:
+        fingerprinters[name] = func
+        return func
+    return decorator
+
+
+@register('md5')
+def md5_fingerprint(fname: str, **kwargs: Any) -> str:
+    """
+    Hash the whole file.
+
+    This is what older versions used as key, it is kept to find their data.
+    """
+    return md5_of_file(fname, **kwargs)
+
+
+@register('sampled')
+def sampled_fingerprint(fname: str, **kwargs: Any) -> str:
+    """
+    Hash the file size and blocks from the head, middle and tail of the file.
+
+    The file's modification time is deliberately left out, so copying or
+    touching a recording keeps its meta data.
+    """
+    size = os.path.getsize(fname)
+    sample_hash = blake2b(str(size).encode(), digest_size=16)
+    with open(fname, "rb") as data:
+        if size <= 3 * SAMPLE_SIZE:
+            sample_hash.update(data.read())
+        else:
+            for offset in (0, (size - SAMPLE_SIZE) // 2, size - SAMPLE_SIZE):
+                data.seek(offset)
+                sample_hash.update(data.read(SAMPLE_SIZE))
+    return 'sampled-' + sample_hash.hexdigest()
+
+
+def fingerprint_of_file(fname: str, method: str = DEFAULT_METHOD,
+                        **kwargs: Any) -> str:
+    """
+    Return the fingerprint of the given file.
+
+    Fingerprints are cached by path, inode, size and modification time, so
+    unchanged files are not read at all.
+
+    :Parameters:
+        - 'fname': filename.
+        - 'method': name of a registered fingerprint function.
+        - 'kwargs': passed on to the fingerprint function.
+
+    :Return:
+        - The fingerprint as string.
+    """
+    path = os.path.realpath(fname)
+    stat = os.stat(path)
+    key = (path, method, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with transaction() as con:
+        row = con.execute('SELECT fingerprint FROM fingerprints WHERE path=? \
+                          AND method=? AND inode=? AND size=? AND mtime=?',
+                          key).fetchone()
+    if row is not None:
+        logger.debug('Cached fingerprint of "%s": %s', path, row[0])
+        tracing.count('fingerprint.cached')
+        return str(row[0])
+    # Don't hold the database while reading the file
+    with tracing.span('fingerprint', method=method, size=stat.st_size):
+        fingerprint = fingerprinters[method](path, **kwargs)
+    logger.debug('Computed fingerprint of "%s": %s', path, fingerprint)
+    with transaction() as con:
+        con.execute('INSERT OR REPLACE INTO fingerprints (path, method, inode, \
+                    size, mtime, fingerprint) VALUES (?, ?, ?, ?, ?, ?)',
+                    key + (fingerprint,))
+    return fingerprint
+
+
+def migrate_legacy(fname: str, fingerprint: str, **kwargs: Any) -> bool:
+    """
+    Move meta data stored under the full md5 hash to the given fingerprint.
+
+    Nothing is done once no rows are left which were never migrated, or if
+    the fingerprint has meta data of its own already. Otherwise the md5 hash
+    is needed. It is cached like fingerprints, so each file is only hashed
+    once, but that may take a while: run this after the file was set up.
+
+    :Return:
+        - Whether meta data was migrated.
+    """
+    with transaction() as con:
+        known = con.execute('SELECT 1 FROM metadata WHERE md5=? AND \
+                            (position IS NOT NULL OR speed IS NOT NULL)',
+                            (fingerprint,)).fetchone() is not None
+        legacy = con.execute("SELECT 1 FROM metadata WHERE md5 NOT LIKE '%-%' \
+                             LIMIT 1").fetchone() is not None
+    if known or not legacy:
+        return False
+    md5 = fingerprint_of_file(fname, 'md5', **kwargs)
+    with transaction() as con:
+        if con.execute('SELECT 1 FROM metadata WHERE md5=?', (md5,)).fetchone() is None:
+            return False
+        # The row stored when the file was opened only holds its path and
+        # access time, keep those
+        row = con.execute('SELECT path, last_accessed FROM metadata WHERE md5=?',
+                          (fingerprint,)).fetchone()
+        con.execute('DELETE FROM metadata WHERE md5=?', (fingerprint,))
+        con.execute('UPDATE metadata SET md5=? WHERE md5=?', (fingerprint, md5))
+        if row is not None:
+            con.execute('UPDATE metadata SET path=?, last_accessed=? WHERE md5=?',
+                        row + (fingerprint,))
+    logger.debug('Migrated meta data of "%s" from %s to %s', fname, md5, fingerprint)
+    return True
@@ -21,11 +21,14 @@ import re
 import datetime
 import gettext
 from gettext import gettext as _
-from typing import Any
+from typing import Any, TYPE_CHECKING
 from collections.abc import Callable
 import gi
 gi.require_version('Gtk', '4.0')
-from gi.repository import Gtk, Gio # NOQA: E402
+from gi.repository import Gio # NOQA: E402
+# Gtk is only imported by the dialog helpers, so the rest works without GUI
+if TYPE_CHECKING:
+    from gi.repository import Gtk # NOQA: E402
 gettext.textdomain('gTranscribe')
 
 # pylint: disable=invalid-name
@@ -129,8 +132,9 @@ def time_to_ns(time: duration | datetime.time) -> int:
     return sum(values)
 
 
-def get_open_filename(self: Any, title: str, filter_name: str, filter_mime: str, callback: Callable[[Gtk.FileDialog, Gio.AsyncResult], None]) -> None:
-    """Display a file open dialog."""
+def _open_dialog(title: str, filter_name: str, filter_mime: str) -> 'Gtk.FileDialog':
+    """Create a file open dialog showing files of the given type."""
+    from gi.repository import Gtk # pylint: disable=import-outside-toplevel
     chooser = Gtk.FileDialog.new()
     chooser.set_title(title)
 
@@ -140,36 +144,66 @@ def get_open_filename(self: Any, title: str, filter_name: str, filter_mime: str,
     filters = Gio.ListStore.new(Gtk.FileFilter)
     filters.append(file_filter)
     chooser.set_filters(filters)
-    chooser.open(self.window, None, callback)
+    return chooser
+
+
+def get_open_filename(self: Any, title: str, filter_name: str, filter_mime: str, callback: Callable[['Gtk.FileDialog', Gio.AsyncResult], None]) -> None:
+    """Display a file open dialog."""
+    _open_dialog(title, filter_name, filter_mime).open(self.window, None, callback)
+
+
+def get_open_filenames(self: Any, title: str, filter_name: str, filter_mime: str, callback: Callable[['Gtk.FileDialog', Gio.AsyncResult], None]) -> None:
+    """Display a file open dialog which allows selecting several files."""
+    _open_dialog(title, filter_name, filter_mime).open_multiple(self.window, None, callback)
 
 
 def get_save_filename(self: Any) -> None:
     """Display a file save dialog."""
+    from gi.repository import Gtk # pylint: disable=import-outside-toplevel
     chooser = Gtk.FileDialog.new()
     chooser.set_title(_("Save Text File"))
     chooser.save(self.window, None, self.save_dialog_callback)
 
 
+def get_folder(self: Any, title: str, callback: Callable[['Gtk.FileDialog', Gio.AsyncResult], None]) -> None:
+    """Display a folder selection dialog."""
+    from gi.repository import Gtk # pylint: disable=import-outside-toplevel
+    chooser = Gtk.FileDialog.new()
+    chooser.set_title(title)
+    chooser.select_folder(self.window, None, callback)
+
+
 def error_message(self: Any, message: str) -> None:
     """Display the string 'message' in an error dialog."""
+    from gi.repository import Gtk # pylint: disable=import-outside-toplevel
     dialog = Gtk.AlertDialog.new(message)
     dialog.show(self.window)
 
 
-def md5_of_file(fname: str) -> str:
+def md5_of_file(fname: str, cancellable: Gio.Cancellable | None = None,
+                progress: Callable[[float], None] | None = None) -> str:
     """
     Calculate the md5 hash of the given file.
 
     :Parameters:
         - 'fname': filename.
+        - 'cancellable': raises GLib.Error once cancelled.
+        - 'progress': called with the fraction of the file read so far.
 
     :Return:
         - A string of length 32, containing the md5 hash as hexadecimal digits.
     """
     md5_hash = md5()
+    size = os.path.getsize(fname)
+    done = 0
     with open(fname, "rb") as data:
         for chunk in iter(lambda: data.read(81920), b""):
+            if cancellable is not None:
+                cancellable.set_error_if_cancelled()
             md5_hash.update(chunk)
+            if progress is not None and size:
+                done += len(chunk)
+                progress(done / size)
     return md5_hash.hexdigest()
 
 
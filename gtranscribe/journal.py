@@ -0,0 +1,215 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Crash-safe journal of the edits made to a transcript."""
+
+# pylint: disable=wrong-import-position
+import os
+import json
+import logging
+from hashlib import blake2b
+from typing import Any
+import gi
+gi.require_version('Gtk', '4.0')
+from gi.repository import GLib, Gtk # NOQA: E402
+from gtranscribe.metadata import cache_dir # NOQA: E402
+logger = logging.getLogger('journal')
+
+journal_dir = os.path.join(cache_dir, "journals")
+
+# Seconds between writing edits to the journal
+FLUSH_INTERVAL = 3
+# Journals growing by more than this are replaced by a snapshot of the text
+COMPACT_SIZE = 1024 * 1024
+
+
+class EditJournal():
+    """
+    Record the edits of a Gtk.TextBuffer in an append-only file.
+
+    Each journal belongs to an audio file and a text file, given by their
+    fingerprint and path. Its first line records the fingerprint of the text
+    file the edits apply to, every other line is one edit: insertion ('i',
+    offset, text), deletion ('d', start, end) or a snapshot of the whole
+    text ('s', text). Edits are collected in memory and appended every
+    FLUSH_INTERVAL seconds.
+    """
+
+    def __init__(self, text_buffer: Gtk.TextBuffer) -> None:
+        self.text_buffer = text_buffer
+        self._path: str | None = None
+        self._ops: list[list[Any]] = []
+        self._flush_id: int | None = None
+        # Size of the journal after it was started or compacted
+        self._base_size = 0
+        text_buffer.connect('insert-text', self.on_insert_text)
+        text_buffer.connect('delete-range', self.on_delete_range)
+
+    @property
+    def active(self) -> bool:
+        """Return if edits are recorded."""
+        return self._path is not None
+
+    @staticmethod
+    def _journal_path(audio: str, text: str | None) -> str:
+        key = blake2b(f'{audio}\0{text or ""}'.encode(), digest_size=16)
+        return os.path.join(journal_dir, key.hexdigest() + '.journal')
+
+    def start(self, audio: str, text: str | None, base: str, replay: bool = True) -> bool:
+        """
+        Start recording edits for the given audio and text file.
+
+        If 'replay' is set and there is a journal for this pair whose edits
+        apply to the text file with fingerprint 'base', it is replayed on the
+        buffer and continued, otherwise a new one is started.
+
+        :Return:
+            - True if edits were replayed.
+        """
+        self.stop()
+        path = self._journal_path(audio, text)
+        replayed = False
+        try:
+            replayed = replay and self._replay(path, base)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, IndexError, TypeError) as e:
+            logger.warning('Could not replay journal "%s": %s', path, e)
+        if not replayed:
+            if not os.path.exists(journal_dir):
+                os.makedirs(journal_dir)
+            self._write(path, [{'audio': audio, 'text': text, 'base': base}], 'w')
+        self._base_size = os.path.getsize(path)
+        self._path = path
+        return replayed
+
+    def stop(self) -> None:
+        """Write pending edits and stop recording."""
+        self.flush()
+        self._path = None
+
+    def discard(self) -> None:
+        """Delete the journal, e.g. because the text was saved."""
+        if self._flush_id is not None:
+            GLib.source_remove(self._flush_id)
+            self._flush_id = None
+        self._ops.clear()
+        if self._path is not None:
+            try:
+                os.unlink(self._path)
+            except FileNotFoundError:
+                pass
+        self._path = None
+
+    def restart(self, audio: str, text: str | None, base: str) -> None:
+        """
+        Start a new journal, e.g. after the text was saved.
+
+        The buffer may differ from the text file, e.g. because of edits made
+        while saving, so the journal starts with a snapshot if the buffer is
+        modified.
+        """
+        self.discard()
+        self.start(audio, text, base, replay=False)
+        if self.text_buffer.get_modified():
+            self.compact()
+
+    def _replay(self, path: str, base: str) -> bool:
+        """Apply the edits of the journal to the buffer if it matches."""
+        with open(path, encoding="utf_8") as journal:
+            lines = journal.readlines()
+        if not lines or json.loads(lines[0]).get('base') != base:
+            return False
+        ops = []
+        for line in lines[1:]:
+            # A crash can leave a partially written last line
+            if not line.endswith('\n'):
+                break
+            ops.append(json.loads(line))
+        if not ops:
+            return False
+        logger.debug('Replaying %d edits from "%s"', len(ops), path)
+        buf = self.text_buffer
+        buf.begin_irreversible_action()
+        for op in ops:
+            if op[0] == 'i':
+                buf.insert(buf.get_iter_at_offset(op[1]), op[2])
+            elif op[0] == 'd':
+                buf.delete(buf.get_iter_at_offset(op[1]), buf.get_iter_at_offset(op[2]))
+            elif op[0] == 's':
+                buf.set_text(op[1])
+        buf.end_irreversible_action()
+        buf.set_modified(True)
+        return True
+
+    # pylint: disable=unused-argument
+    def on_insert_text(self, text_buffer: Gtk.TextBuffer, location: Gtk.TextIter, text: str, length: int) -> None:
+        """Record an insertion."""
+        if self._path is not None:
+            self._record(['i', location.get_offset(), text])
+
+    # pylint: disable=unused-argument
+    def on_delete_range(self, text_buffer: Gtk.TextBuffer, start: Gtk.TextIter, end: Gtk.TextIter) -> None:
+        """Record a deletion."""
+        if self._path is not None:
+            self._record(['d', start.get_offset(), end.get_offset()])
+
+    def _record(self, op: list[Any]) -> None:
+        self._ops.append(op)
+        if self._flush_id is None:
+            self._flush_id = GLib.timeout_add_seconds(FLUSH_INTERVAL, self._on_flush_timeout)
+
+    def _on_flush_timeout(self) -> bool:
+        self._flush_id = None
+        self.flush()
+        return False
+
+    def flush(self) -> None:
+        """Append the recorded edits to the journal."""
+        if self._flush_id is not None:
+            GLib.source_remove(self._flush_id)
+            self._flush_id = None
+        if self._path is None or not self._ops:
+            return
+        try:
+            self._write(self._path, self._ops, 'a')
+            self._ops.clear()
+            if os.path.getsize(self._path) - self._base_size > COMPACT_SIZE:
+                self.compact()
+        except OSError as e:
+            logger.error('Could not write journal "%s": %s', self._path, e)
+
+    def compact(self) -> None:
+        """Replace the edits in the journal by a snapshot of the text."""
+        if self._path is None:
+            return
+        with open(self._path, encoding="utf_8") as journal:
+            header = json.loads(journal.readline())
+        text = self.text_buffer.get_text(self.text_buffer.get_start_iter(),
+                                         self.text_buffer.get_end_iter(), True)
+        self._ops.clear()
+        self._write(self._path + '.tmp', [header, ['s', text]], 'w')
+        os.replace(self._path + '.tmp', self._path)
+        self._base_size = os.path.getsize(self._path)
+        logger.debug('Compacted journal "%s"', self._path)
+
+    @staticmethod
+    def _write(path: str, lines: list[Any], mode: str) -> None:
+        """Write the given lines as JSON and make sure they hit the disk."""
+        with open(path, mode, encoding="utf_8") as journal:
+            for line in lines:
+                journal.write(json.dumps(line) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
@@ -0,0 +1,108 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Fingerprint audio files in a worker thread."""
+
+import logging
+import threading
+from gi.repository import GLib, GObject, Gio
+from gtranscribe.fingerprint import fingerprint_of_file, migrate_legacy
+logger = logging.getLogger('loader')
+
+
+class FileLoader(GObject.Object):
+    """
+    Compute the fingerprint of an audio file without blocking the main loop.
+
+    After 'fingerprinted', meta data stored under the md5 hash by older
+    versions is looked up and 'migrated' is emitted if it was moved to the
+    fingerprint. All signals are emitted on the main loop. Starting a new
+    load cancels the previous one, whose results are silently dropped.
+    """
+
+    __gtype_name__ = 'gTranscribeFileLoader'
+
+    __gsignals__ = {
+        'progress': (GObject.SignalFlags.RUN_LAST, None,
+                     (GObject.TYPE_STRING, GObject.TYPE_DOUBLE)),
+        'fingerprinted': (GObject.SignalFlags.RUN_LAST, None,
+                          (GObject.TYPE_STRING, GObject.TYPE_STRING)),
+        'migrated': (GObject.SignalFlags.RUN_LAST, None,
+                     (GObject.TYPE_STRING, GObject.TYPE_STRING)),
+        'failed': (GObject.SignalFlags.RUN_LAST, None,
+                   (GObject.TYPE_STRING, GObject.TYPE_STRING))
+    }
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._cancellable: Gio.Cancellable | None = None
+
+    def load(self, filepath: str) -> None:
+        """Start fingerprinting the given file."""
+        self.cancel()
+        cancellable = Gio.Cancellable()
+        self._cancellable = cancellable
+        thread = threading.Thread(target=self._run, args=(filepath, cancellable),
+                                  name='gTranscribe loader', daemon=True)
+        thread.start()
+
+    def cancel(self) -> None:
+        """Cancel the running load, if any."""
+        if self._cancellable is not None:
+            self._cancellable.cancel()
+            self._cancellable = None
+
+    def _run(self, filepath: str, cancellable: Gio.Cancellable) -> None:
+        """Worker thread: fingerprint the file and report back."""
+        last = [-1]
+
+        def progress(fraction: float) -> None:
+            # Only bother the main loop with whole percent steps
+            percent = int(fraction * 100)
+            if percent != last[0]:
+                last[0] = percent
+                GLib.idle_add(self._emit, cancellable, 'progress', filepath,
+                              fraction)
+
+        try:
+            fingerprint = fingerprint_of_file(filepath, cancellable=cancellable,
+                                              progress=progress)
+        except GLib.Error as error:
+            logger.debug('Loading "%s" stopped: %s', filepath, error.message)
+            return
+        except OSError as error:
+            logger.error('Could not read "%s": %s', filepath, error)
+            GLib.idle_add(self._emit, cancellable, 'failed', filepath,
+                          str(error))
+            return
+        GLib.idle_add(self._emit, cancellable, 'fingerprinted', filepath,
+                      fingerprint)
+        # The meta data row is stored once the file is fingerprinted, the
+        # migration replaces it
+        try:
+            migrated = migrate_legacy(filepath, fingerprint, cancellable=cancellable)
+        except (GLib.Error, OSError) as error:
+            logger.debug('Looking up legacy meta data of "%s" stopped: %s',
+                         filepath, error)
+            return
+        if migrated:
+            GLib.idle_add(self._emit, cancellable, 'migrated', filepath, fingerprint)
+
+    def _emit(self, cancellable: Gio.Cancellable, signal: str, filepath: str,
+              value: object) -> bool:
+        """Emit a signal on the main loop unless the load was cancelled."""
+        if not cancellable.is_cancelled():
+            self.emit(signal, filepath, value)
+        return False
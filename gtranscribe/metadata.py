@@ -14,16 +14,194 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
+import math
+import time
 import sqlite3
 import os.path
 import logging
-from typing import Any, Dict
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, NamedTuple, Tuple
+from collections.abc import Iterator
 from gi.repository import GLib
+from gtranscribe import tracing
 logger = logging.getLogger('fileinfo')
 
 cache_dir = os.path.join(GLib.get_user_cache_dir(), "gTranscribe")
 database = os.path.join(cache_dir, "metadata.db")
 
+# Delay in milliseconds before queued attribute updates are written
+FLUSH_DELAY = 2000
+# Size in bytes above which the least recently used files are forgotten
+SIZE_BUDGET = 32 * 1024 * 1024
+# Pruning shrinks the database to this fraction of the budget, so it
+# doesn't run again right away
+PRUNE_TARGET = 0.75
+
+# The connection is shared by all threads, access is serialized by _lock
+_connection: sqlite3.Connection | None = None
+_lock = threading.RLock()
+# Attribute updates not yet written, keyed by (md5, attribute)
+_pending: Dict[Tuple[str, str], Any] = {}
+_flush_id: int | None = None
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """
+    Provide the shared database connection within one transaction.
+
+    The transaction is committed on success and rolled back on errors.
+    """
+    global _connection  # pylint: disable=global-statement
+    with _lock:
+        if _connection is None:
+            # make sure our cache directory exists
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            _connection = sqlite3.connect(database, check_same_thread=False)
+            # WAL avoids a full fsync of the database on every commit
+            _connection.execute('PRAGMA journal_mode=WAL')
+            _connection.execute('PRAGMA synchronous=NORMAL')
+            _create_tables(_connection)
+        with tracing.span('db'), _connection:
+            yield _connection
+
+
+def _add_column(con: sqlite3.Connection, table: str, column: str, kind: str) -> None:
+    """Add a column unless the table already has it."""
+    columns = {row[1] for row in con.execute('PRAGMA table_info(' + table + ')')}
+    if column not in columns:
+        con.execute('ALTER TABLE ' + table + ' ADD COLUMN ' + column + ' ' + kind)
+
+
+# Migrations must be repeatable, databases of earlier versions may already
+# have some of the columns they add
+
+def _schema_1(con: sqlite3.Connection) -> None:
+    """Create the tables of databases from before schema versions."""
+    con.execute('CREATE TABLE IF NOT EXISTS metadata(md5 TEXT PRIMARY KEY,\
+                position INTEGER, speed REAL)')
+    _add_column(con, 'metadata', 'loop_start', 'INTEGER')
+    _add_column(con, 'metadata', 'loop_end', 'INTEGER')
+    con.execute('CREATE TABLE IF NOT EXISTS fingerprints(path TEXT,\
+                method TEXT, inode INTEGER, size INTEGER, mtime INTEGER,\
+                fingerprint TEXT, PRIMARY KEY (path, method))')
+    con.execute('CREATE TABLE IF NOT EXISTS speech(md5 TEXT PRIMARY KEY,\
+                version INTEGER, segments BLOB)')
+    con.execute('CREATE TABLE IF NOT EXISTS queue(path TEXT PRIMARY KEY,\
+                seq INTEGER, transcript TEXT, duration INTEGER)')
+
+
+def _schema_2(con: sqlite3.Connection) -> None:
+    """Add access times, paths, transcripts and bookmarks."""
+    _add_column(con, 'metadata', 'last_accessed', 'INTEGER')
+    _add_column(con, 'metadata', 'path', 'TEXT')
+    _add_column(con, 'metadata', 'transcript', 'TEXT')
+    con.execute('CREATE INDEX IF NOT EXISTS metadata_last_accessed \
+                ON metadata(last_accessed)')
+    con.execute('CREATE TABLE IF NOT EXISTS bookmarks(md5 TEXT, position INTEGER,\
+                name TEXT, PRIMARY KEY (md5, position)) WITHOUT ROWID')
+
+
+# Migrations in order, the schema version is the number of migrations run
+MIGRATIONS = [_schema_1, _schema_2]
+
+
+def _create_tables(con: sqlite3.Connection) -> None:
+    """
+    Bring the tables for meta data up to the current schema version.
+
+    Each migration runs in its own transaction together with bumping the
+    version. The version is read within the transaction, so processes
+    opening the database at the same time don't migrate it twice.
+    """
+    while True:
+        # sqlite3 doesn't open transactions for DDL statements by itself
+        con.execute('BEGIN IMMEDIATE')
+        try:
+            version = con.execute('PRAGMA user_version').fetchone()[0]
+            if version >= len(MIGRATIONS):
+                con.commit()
+                if version > len(MIGRATIONS):
+                    logger.warning('Database schema %d is newer than this version (%d)',
+                                   version, len(MIGRATIONS))
+                return
+            MIGRATIONS[version](con)
+            # PRAGMA doesn't take parameters, the version is our own number
+            con.execute(f'PRAGMA user_version={version + 1}')
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+        logger.debug('Migrated database schema to %d', version + 1)
+
+
+def _size(con: sqlite3.Connection) -> int:
+    """Return the size of the data in the database in bytes."""
+    pages = con.execute('PRAGMA page_count').fetchone()[0] - \
+        con.execute('PRAGMA freelist_count').fetchone()[0]
+    return int(pages * con.execute('PRAGMA page_size').fetchone()[0])
+
+
+def prune(budget: int = SIZE_BUDGET, keep: str | None = None) -> int:
+    """
+    Forget the least recently used files if the database exceeds 'budget'.
+
+    Deleted rows free pages only once B-tree pages merge, so the size can't
+    be watched while deleting. Instead the number of files to forget is
+    estimated from the average size per file, then the database is
+    vacuumed.
+
+    :Parameters:
+        - 'budget': size of the database in bytes.
+        - 'keep': fingerprint of a file which is never forgotten.
+
+    :Return:
+        - The number of files forgotten.
+    """
+    with transaction() as con:
+        size = _size(con)
+        total = con.execute('SELECT COUNT(*) FROM metadata').fetchone()[0]
+        if size <= budget or not total:
+            return 0
+        count = math.ceil((size - budget * PRUNE_TARGET) / (size / total))
+        # Files which were never opened since access times are recorded
+        # sort first
+        con.execute('CREATE TEMP TABLE pruned AS SELECT md5, path FROM metadata \
+                    WHERE md5 IS NOT ? ORDER BY last_accessed LIMIT ?', (keep, count))
+        removed = con.execute('SELECT COUNT(*) FROM pruned').fetchone()[0]
+        con.execute('DELETE FROM metadata WHERE md5 IN (SELECT md5 FROM pruned)')
+        con.execute('DELETE FROM queue WHERE path IN (SELECT path FROM pruned)')
+        con.execute('DROP TABLE pruned')
+        con.execute('DELETE FROM speech WHERE md5 NOT IN (SELECT md5 FROM metadata)')
+        con.execute('DELETE FROM bookmarks WHERE md5 NOT IN (SELECT md5 FROM metadata)')
+        # Cached md5 hashes save looking for legacy meta data again
+        con.execute("DELETE FROM fingerprints WHERE method!='md5' AND \
+                    fingerprint NOT IN (SELECT md5 FROM metadata)")
+    with tracing.span('db.vacuum'), _lock:
+        assert _connection is not None
+        _connection.execute('VACUUM')
+    logger.debug('Pruned meta data of %d files', removed)
+    return removed
+
+
+class RecentFile(NamedTuple):
+    """A recently opened audio file with its transcript, if known."""
+
+    path: str
+    transcript: str | None
+    last_accessed: int
+
+
+def _on_flush_timeout() -> bool:
+    """Write queued updates once the flush delay has passed."""
+    global _flush_id  # pylint: disable=global-statement
+    with _lock:
+        _flush_id = None
+    MetaData.flush()
+    return False
+
 
 class MetaData():
     """
@@ -43,27 +221,29 @@ class MetaData():
         # Use cached values if available to limit requests
         if attribute in self._cache:
             return self._cache[attribute]
-        con = sqlite3.connect(database)
-        cur = con.cursor()
-        query = 'SELECT ' + attribute + ' FROM metadata WHERE md5=?'
-        cur.execute(query, (self.md5,))
-        value = cur.fetchone()[0]
-        cur.close()
-        con.close()
+        with _lock:
+            if (self.md5, attribute) in _pending:
+                value = _pending[(self.md5, attribute)]
+            else:
+                with transaction() as con:
+                    query = 'SELECT ' + attribute + ' FROM metadata WHERE md5=?'
+                    value = con.execute(query, (self.md5,)).fetchone()[0]
         self._cache[attribute] = value
         logger.debug('Get attribute "%s": %s', attribute, value)
         return value
 
     def _set_data(self, attribute: str, value: Any) -> None:
-        """Hide the verbose process of setting attributes."""
+        """
+        Hide the verbose process of setting attributes.
+
+        Updates are queued and written together by flush().
+        """
+        global _flush_id  # pylint: disable=global-statement
         logger.debug('Set attribute "%s": %s', attribute, value)
-        query = 'UPDATE metadata SET ' + attribute + '=? WHERE md5=?'
-        con = sqlite3.connect(database)
-        cur = con.cursor()
-        cur.execute(query, (value, self.md5))
-        con.commit()
-        cur.close()
-        con.close()
+        with _lock:
+            _pending[(self.md5, attribute)] = value
+            if _flush_id is None:
+                _flush_id = GLib.timeout_add(FLUSH_DELAY, _on_flush_timeout)
         self._cache[attribute] = value
 
     def _get_position(self) -> int:
@@ -84,29 +264,134 @@ class MetaData():
     def _set_speed(self, speed: float) -> None:
         self._set_data("speed", speed)
 
+    def _get_transcript(self) -> str | None:
+        transcript = self._get_data("transcript")
+        return transcript if isinstance(transcript, str) else None
+
+    def _set_transcript(self, transcript: str | None) -> None:
+        self._set_data("transcript", transcript)
+
+    def _get_loop(self) -> tuple[int, int] | None:
+        start = self._get_data("loop_start")
+        end = self._get_data("loop_end")
+        if not isinstance(start, int) or not isinstance(end, int) or start >= end:
+            return None
+        return start, end
+
+    def _set_loop(self, loop: tuple[int, int] | None) -> None:
+        start, end = loop if loop is not None else (None, None)
+        self._set_data("loop_start", start)
+        self._set_data("loop_end", end)
+
     position = property(_get_position, _set_position)
     speed = property(_get_speed, _set_speed)
+    transcript = property(_get_transcript, _set_transcript)
+    loop = property(_get_loop, _set_loop)
+
+    def bookmarks(self, start: int = 0,
+                  end: int | None = None) -> list[tuple[int, str]]:
+        """Return position and name of the bookmarks from 'start' to 'end' ns."""
+        with transaction() as con:
+            rows = con.execute('SELECT position, name FROM bookmarks WHERE md5=? \
+                               AND position>=? AND position<=? ORDER BY position',
+                               (self.md5, start, end if end is not None else 2**63 - 1))
+            return [(int(position), str(name)) for position, name in rows]
+
+    def bookmark_after(self, position: int) -> int | None:
+        """Return the position of the first bookmark after 'position'."""
+        with transaction() as con:
+            row = con.execute('SELECT position FROM bookmarks WHERE md5=? \
+                              AND position>? ORDER BY position LIMIT 1',
+                              (self.md5, position)).fetchone()
+        return int(row[0]) if row is not None else None
+
+    def bookmark_before(self, position: int) -> int | None:
+        """Return the position of the last bookmark before 'position'."""
+        with transaction() as con:
+            row = con.execute('SELECT position FROM bookmarks WHERE md5=? \
+                              AND position<? ORDER BY position DESC LIMIT 1',
+                              (self.md5, position)).fetchone()
+        return int(row[0]) if row is not None else None
+
+    def add_bookmark(self, position: int, name: str) -> None:
+        """Add a bookmark, replacing one at the same position."""
+        with transaction() as con:
+            con.execute('INSERT OR REPLACE INTO bookmarks (md5, position, name) \
+                        VALUES (?, ?, ?)', (self.md5, position, name))
+
+    def remove_bookmark(self, position: int) -> None:
+        with transaction() as con:
+            con.execute('DELETE FROM bookmarks WHERE md5=? AND position=?',
+                        (self.md5, position))
 
-    def store_md5(self) -> None:
-        """Store the given md5 hash in the database for meta data."""
-        con = sqlite3.connect(database)
-        cur = con.cursor()
-        cur.execute('INSERT OR IGNORE INTO metadata (md5) VALUES (?)',
-                    (self.md5,))
-        con.commit()
-        cur.close()
-        con.close()
+    @staticmethod
+    def recent(count: int = 10) -> list[RecentFile]:
+        """Return the most recently opened files, newest first."""
+        with transaction() as con:
+            rows = con.execute('SELECT path, transcript, last_accessed FROM metadata \
+                               WHERE last_accessed IS NOT NULL \
+                               ORDER BY last_accessed DESC LIMIT ?', (count,))
+            return [RecentFile(*row) for row in rows]
+
+    @staticmethod
+    def flush() -> None:
+        """Write all queued attribute updates in a single transaction."""
+        global _flush_id  # pylint: disable=global-statement
+        with _lock:
+            if _flush_id is not None:
+                GLib.source_remove(_flush_id)
+                _flush_id = None
+            if not _pending:
+                return
+            updates: Dict[str, list[Tuple[Any, str]]] = {}
+            for (md5, attribute), value in _pending.items():
+                updates.setdefault(attribute, []).append((value, md5))
+            with transaction() as con:
+                for attribute, rows in updates.items():
+                    query = 'UPDATE metadata SET ' + attribute + '=? WHERE md5=?'
+                    con.executemany(query, rows)
+            logger.debug('Flushed %d attribute updates', len(_pending))
+            _pending.clear()
+
+    @staticmethod
+    def close(keep: str | None = None) -> None:
+        """
+        Flush queued updates, prune and close the database connection.
+
+        The meta data of the fingerprint 'keep' is never pruned.
+        """
+        global _connection  # pylint: disable=global-statement
+        MetaData.flush()
+        with _lock:
+            if _connection is not None:
+                try:
+                    prune(keep=keep)
+                except sqlite3.Error as e:
+                    logger.debug('Pruning meta data failed: %s', e)
+            if _connection is not None:
+                _connection.close()
+                _connection = None
+
+    def store_md5(self, accessed: bool = True) -> None:
+        """
+        Store the given fingerprint in the database for meta data.
+
+        With 'accessed' the file is recorded as opened just now.
+        """
+        with transaction() as con:
+            con.execute('INSERT OR IGNORE INTO metadata (md5) VALUES (?)',
+                        (self.md5,))
+            con.execute('UPDATE metadata SET path=? WHERE md5=?',
+                        (self.filepath, self.md5))
+            if accessed:
+                con.execute('UPDATE metadata SET last_accessed=? WHERE md5=?',
+                            (time.time_ns(), self.md5))
 
     def init_db(self) -> None:
-        """Create the database for meta data if necessary."""
-        # make sure our cache directory exists
-        if not os.path.exists(cache_dir):
-            os.makedirs(cache_dir)
-
-        con = sqlite3.connect(database)
-        cur = con.cursor()
-        cur.execute('CREATE TABLE IF NOT EXISTS metadata(md5 TEXT PRIMARY KEY,\
-                    position INTEGER, speed REAL)')
-        con.commit()
-        cur.close()
-        con.close()
+        """
+        Create the database for meta data if necessary.
+
+        This happens on first use anyway, calling it just does it right away.
+        """
+        with transaction():
+            pass
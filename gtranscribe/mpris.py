@@ -14,26 +14,120 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
-"""MPRIS D-Bus interface for media key support."""
+"""MPRIS D-Bus interface for media keys and remote control."""
 
+import os
+import json
 import logging
 from typing import Any, Dict
 import dbus
 import dbus.service
+from gi.repository import GLib
+from gtranscribe import tracing
 
 logger = logging.getLogger('mpris')
 
+NO_TRACK = dbus.ObjectPath('/org/mpris/MediaPlayer2/TrackList/NoTrack')
+
+
+def track_id(fingerprint: str) -> dbus.ObjectPath:
+    """Return the MPRIS track id of the file with the given fingerprint."""
+    return dbus.ObjectPath(f'/org/innir/gtranscribe/track/{fingerprint}')
+
 
 class MPRISInterface(dbus.service.Object):
-    """MPRIS D-Bus interface for media key support."""
+    """
+    MPRIS D-Bus interface for media keys and remote control.
+
+    Properties are cached. The application calls changed() whenever the
+    state may have changed, the properties are then compared to the cache
+    once the main loop is idle and PropertiesChanged is emitted with the
+    ones that differ. Position is never cached, as the spec demands, jumps
+    are announced by the Seeked signal instead.
+    """
     
     MPRIS_IFACE = 'org.mpris.MediaPlayer2'
     MPRIS_PLAYER_IFACE = 'org.mpris.MediaPlayer2.Player'
+    STATS_IFACE = 'org.innir.gtranscribe.Stats'
     
     def __init__(self, bus_name: dbus.service.BusName, app: Any) -> None:
         dbus.service.Object.__init__(self, bus_name, '/org/mpris/MediaPlayer2')
         self.app = app
+        self._properties = {
+            self.MPRIS_IFACE: {
+                'CanQuit': True,
+                'CanRaise': True,
+                'HasTrackList': False,
+                'Identity': 'gTranscribe',
+                'DesktopEntry': 'org.innir.gtranscribe',
+                'SupportedUriSchemes': dbus.Array([], signature='s'),
+                'SupportedMimeTypes': dbus.Array([], signature='s'),
+            },
+            self.MPRIS_PLAYER_IFACE: self._player_properties(),
+        }
+        self._update_id: int | None = None
     
+    def _player_properties(self) -> Dict[str, Any]:
+        """Return the current state of the player properties but Position."""
+        loaded = self.app.slider.is_sensitive()
+        adjustment = self.app.speedscale.get_adjustment()
+        metadata = dbus.Dictionary({'mpris:trackid': NO_TRACK}, signature='sv')
+        if self.app.md5 is not None:
+            filename = self.app.player.filename
+            metadata['mpris:trackid'] = track_id(self.app.md5)
+            metadata['xesam:title'] = os.path.basename(filename)
+            metadata['xesam:url'] = GLib.filename_to_uri(filename)
+            if loaded:
+                metadata['mpris:length'] = dbus.Int64(self.app.player.duration // 1000)
+        if not loaded:
+            status = 'Stopped'
+        elif self.app.play_action.get_active():
+            status = 'Playing'
+        else:
+            status = 'Paused'
+        return {
+            'CanControl': True,
+            'CanPlay': loaded,
+            'CanPause': loaded,
+            'CanSeek': loaded,
+            'CanGoNext': self.app.forward_button.is_sensitive(),
+            'CanGoPrevious': self.app.rewind_button.is_sensitive(),
+            'PlaybackStatus': status,
+            'LoopStatus': 'None',
+            'Shuffle': False,
+            'Metadata': metadata,
+            'Rate': dbus.Double(self.app.speedscale.get_value()),
+            'MinimumRate': dbus.Double(adjustment.get_lower()),
+            'MaximumRate': dbus.Double(adjustment.get_upper()),
+            'Volume': dbus.Double(self.app.volumebutton.get_value()),
+        }
+
+    def changed(self) -> None:
+        """Schedule comparing the properties to the cache."""
+        if self._update_id is None:
+            self._update_id = GLib.idle_add(self._update)
+
+    def _update(self) -> bool:
+        """Emit PropertiesChanged for the properties which changed."""
+        if self._update_id is not None:
+            GLib.source_remove(self._update_id)
+            self._update_id = None
+        cached = self._properties[self.MPRIS_PLAYER_IFACE]
+        current = self._player_properties()
+        changed = {name: value for name, value in current.items()
+                   if cached.get(name) != value}
+        if changed:
+            self._properties[self.MPRIS_PLAYER_IFACE] = current
+            logger.debug('MPRIS: %s changed', ', '.join(changed))
+            self.PropertiesChanged(self.MPRIS_PLAYER_IFACE,
+                                   dbus.Dictionary(changed, signature='sv'),
+                                   dbus.Array([], signature='s'))
+        return False
+
+    def seeked(self, position: int) -> None:
+        """Announce a jump to the given position in ns."""
+        self.Seeked(dbus.Int64(position // 1000))
+
     @dbus.service.method(MPRIS_PLAYER_IFACE)
     def Play(self) -> None:
         """Handle Play command from media keys."""
@@ -74,6 +168,35 @@ class MPRISInterface(dbus.service.Object):
         if self.app.rewind_button.is_sensitive():
             self.app.rewind(None)
     
+    @dbus.service.method(MPRIS_PLAYER_IFACE, in_signature='x')
+    def Seek(self, offset: int) -> None:
+        """Move the position by 'offset' microseconds."""
+        logger.debug('MPRIS: Seek %d', offset)
+        if self.app.slider.is_sensitive():
+            self.app.move_position(int(offset) * 1000)
+
+    @dbus.service.method(MPRIS_PLAYER_IFACE, in_signature='ox')
+    def SetPosition(self, track: str, position: int) -> None:
+        """Jump to 'position' microseconds if 'track' is still current."""
+        logger.debug('MPRIS: SetPosition %d', position)
+        if not self.app.slider.is_sensitive() or self.app.md5 is None or \
+                track != track_id(self.app.md5):
+            return
+        position = int(position) * 1000
+        if 0 <= position <= self.app.player.duration:
+            self.app.set_position(position)
+
+    @dbus.service.method(MPRIS_PLAYER_IFACE, in_signature='s')
+    def OpenUri(self, uri: str) -> None:
+        """Opening files remotely is not supported."""
+        raise dbus.exceptions.DBusException(
+            'Opening URIs is not supported',
+            name='org.freedesktop.DBus.Error.NotSupported')
+
+    @dbus.service.signal(MPRIS_PLAYER_IFACE, signature='x')
+    def Seeked(self, position: int) -> None:
+        """Signal a jump to 'position' microseconds."""
+
     @dbus.service.method(MPRIS_IFACE)
     def Raise(self) -> None:
         """Raise the application window."""
@@ -86,35 +209,52 @@ class MPRISInterface(dbus.service.Object):
         logger.debug('MPRIS: Quit')
         self.app.quit()
     
+    @dbus.service.method(STATS_IFACE, out_signature='s')
+    def GetStats(self) -> str:
+        """Return the tracing counters and span summary as JSON."""
+        return json.dumps(tracing.stats())
+
     @dbus.service.method(dbus.PROPERTIES_IFACE, in_signature='ss', out_signature='v')
     def Get(self, interface: str, prop: str) -> Any:
         """Get property."""
-        return self.GetAll(interface)[prop]
+        properties = self.GetAll(interface)
+        if prop not in properties:
+            raise dbus.exceptions.DBusException(
+                f'No property {prop} on {interface}',
+                name='org.freedesktop.DBus.Error.InvalidArgs')
+        return properties[prop]
     
     @dbus.service.method(dbus.PROPERTIES_IFACE, in_signature='s', out_signature='a{sv}')
     def GetAll(self, interface: str) -> Dict[str, Any]:
         """Get all properties."""
-        if interface == self.MPRIS_IFACE:
-            return {
-                'CanQuit': True,
-                'CanRaise': True,
-                'HasTrackList': False,
-                'Identity': 'gTranscribe',
-                'DesktopEntry': 'org.innir.gtranscribe',
-            }
-        elif interface == self.MPRIS_PLAYER_IFACE:
-            return {
-                'CanControl': True,
-                'CanPlay': self.app.slider.is_sensitive(),
-                'CanPause': self.app.slider.is_sensitive(),
-                'CanSeek': self.app.slider.is_sensitive(),
-                'CanGoNext': self.app.forward_button.is_sensitive(),
-                'CanGoPrevious': self.app.rewind_button.is_sensitive(),
-                'PlaybackStatus': 'Playing' if self.app.play_action.get_active() else 'Paused',
-            }
-        return {}
+        if interface == self.MPRIS_PLAYER_IFACE:
+            # Don't answer with a state which is about to change
+            if self._update_id is not None:
+                self._update()
+            properties = dict(self._properties[interface])
+            position = self.app.player.position if self.app.md5 is not None else 0
+            properties['Position'] = dbus.Int64((position or 0) // 1000)
+            return properties
+        return self._properties.get(interface, {})
     
     @dbus.service.method(dbus.PROPERTIES_IFACE, in_signature='ssv')
     def Set(self, interface: str, prop: str, value: Any) -> None:
-        """Set property (not implemented)."""
-        pass
+        """Set Rate and Volume, the other properties are read only."""
+        logger.debug('MPRIS: Set %s to %s', prop, value)
+        if interface == self.MPRIS_PLAYER_IFACE and prop == 'Rate':
+            if value == 0:
+                # A rate of 0 pauses, as the spec demands
+                self.app.play_action.set_active(False)
+            else:
+                self.app.speedscale.set_value(float(value))
+        elif interface == self.MPRIS_PLAYER_IFACE and prop == 'Volume':
+            self.app.volumebutton.set_value(max(0.0, float(value)))
+        else:
+            raise dbus.exceptions.DBusException(
+                f'Property {prop} of {interface} is read only',
+                name='org.freedesktop.DBus.Error.PropertyReadOnly')
+
+    @dbus.service.signal(dbus.PROPERTIES_IFACE, signature='sa{sv}as')
+    def PropertiesChanged(self, interface: str, changed: Dict[str, Any],
+                          invalidated: list[str]) -> None:
+        """Signal changed properties."""
@@ -15,12 +15,35 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 # pylint: disable=wrong-import-position
+import sys
 import logging
+from array import array
+from collections.abc import Iterator
 import gi
 gi.require_version('Gst', '1.0')
-from gi.repository import Gst, GObject # NOQA: E402
+from gi.repository import Gst, GObject, GLib, Gio # NOQA: E402
+from gtranscribe import tracing # NOQA: E402
+from gtranscribe.replay import ReplayBuffer, Replayer # NOQA: E402
+from gtranscribe.speech import Speech # NOQA: E402
 logger = logging.getLogger('player')
-Gst.init(None)
+
+# How often to query the position before falling back to the cached one
+POSITION_RETRIES = 3
+# Seeks requested less than this many ms after the previous one are merged
+SEEK_INTERVAL = 40
+
+# Sample accurate seeks for short jumps, which should land exactly where
+# asked, and the nearest keyframe for coarse jumps like slider drags, which
+# is much faster for compressed formats
+ACCURATE_SEEK = Gst.SeekFlags.FLUSH | Gst.SeekFlags.ACCURATE
+FAST_SEEK = Gst.SeekFlags.FLUSH | Gst.SeekFlags.KEY_UNIT | Gst.SeekFlags.SNAP_NEAREST
+
+def init_gstreamer() -> None:
+    """Initialize GStreamer, which scans the plugins on first start."""
+    if not Gst.is_initialized():
+        with tracing.span('gst_init'):
+            Gst.init(None)
+
 
 # pylint: disable=invalid-name
 class gTranscribePlayer(Gst.Bin):
@@ -31,92 +54,447 @@ class gTranscribePlayer(Gst.Bin):
     __gsignals__ = {
         'ready': (GObject.SignalFlags.RUN_LAST, None, (GObject.TYPE_STRING,)),
         'ended': (GObject.SignalFlags.RUN_LAST, None, ()),
-        'duration_changed': (GObject.SignalFlags.RUN_LAST, None, ())
+        'duration_changed': (GObject.SignalFlags.RUN_LAST, None, ()),
+        'seeked': (GObject.SignalFlags.RUN_LAST, None, (GObject.TYPE_INT64,))
     }
 
     def __init__(self) -> None:
+        init_gstreamer()
         super().__init__()
 
         self._rate: float = 1
         self._duration: int | None = None
         self._message_type: Gst.MessageType = Gst.MessageType.UNKNOWN
+        # The opened file, which may be played from a proxy
+        self._filepath: str | None = None
+        # File which is prerolling and has not emitted 'ready' yet
+        self._opening: str | None = None
+        # Position and play state to restore after switching to a proxy
+        self._switching: tuple[int, bool] | None = None
+        # Last known position and the pipeline clock time it was known at,
+        # the latter only while playing
+        self._last_position: int | None = None
+        self._last_clock: int | None = None
+        # Pipeline prerolling the file which is likely opened next
+        self._standby: tuple[Gst.Pipeline, Gst.Element, Gst.Element, Gst.Pad] | None = None
+        # Seek waiting for the running SEEK_INTERVAL to pass
+        self._pending_seek: tuple[int, Gst.SeekFlags] | None = None
+        self._seek_id: int | None = None
+        # Target of the seek the pipeline is flushing for
+        self._seek_target: int | None = None
+        # Start and end of the A-B loop
+        self._loop: tuple[int, int] | None = None
+        # Utterances whose gaps are skipped while playing and the timer for
+        # the end of the current one
+        self._speech: Speech | None = None
+        self._skip_id: int | None = None
+        # Start of the running preroll and seek for tracing
+        self._open_start: float | None = None
+        self._seek_start: float | None = None
+        # Decoded audio played last, replayed from memory when jumping back
+        # into it. While replaying, the pipeline is paused at _resume_at.
+        self._ring = ReplayBuffer()
+        self._replayer: Replayer | None = None
+        self._resume_at: int | None = None
+        self._replay_from: int | None = None
         self.init_pipeline()
 
     def init_pipeline(self) -> None:
         """Initialize the audio pipeline."""
-        self.pipeline = Gst.Pipeline()
-        self.audiosrc = Gst.ElementFactory.make('filesrc', None)
+        self.pipeline, self.audiosrc, self.volume_element, self.apad = \
+            self._build_pipeline()
+
+    def _build_pipeline(self) -> tuple[Gst.Pipeline, Gst.Element, Gst.Element, Gst.Pad]:
+        """Build an audio pipeline and return it with the elements we need."""
+        pipeline = Gst.Pipeline()
+        audiosrc = Gst.ElementFactory.make('filesrc', None)
         decoder = Gst.ElementFactory.make('decodebin', None)
         convert = Gst.ElementFactory.make('audioconvert', None)
         resample = Gst.ElementFactory.make('audioresample', None)
-        self.volume_element = Gst.ElementFactory.make('volume', None)
-        self.volume_element.set_property('volume', 1)
+        volume_element = Gst.ElementFactory.make('volume', None)
+        volume_element.set_property('volume', 1)
         scaletempo = Gst.ElementFactory.make('scaletempo', None)
         sink = Gst.ElementFactory.make('autoaudiosink', None)
 
-        decoder.connect('pad-added', self.on_new_decoded_pad)
-
-        self.pipeline.add(self.audiosrc)
-        self.pipeline.add(decoder)
-        self.pipeline.add(convert)
-        self.pipeline.add(resample)
-        self.pipeline.add(self.volume_element)
-        self.pipeline.add(scaletempo)
-        self.pipeline.add(sink)
-
-        self.audiosrc.link(decoder)
+        apad = convert.get_static_pad('sink')
+        decoder.connect('pad-added', self.on_new_decoded_pad, apad)
+        volume_element.get_static_pad('sink').add_probe(
+            Gst.PadProbeType.BUFFER | Gst.PadProbeType.EVENT_DOWNSTREAM |
+            Gst.PadProbeType.EVENT_FLUSH, self._on_pcm_probe, volume_element)
+
+        pipeline.add(audiosrc)
+        pipeline.add(decoder)
+        pipeline.add(convert)
+        pipeline.add(resample)
+        pipeline.add(volume_element)
+        pipeline.add(scaletempo)
+        pipeline.add(sink)
+
+        audiosrc.link(decoder)
         convert.link(resample)
-        resample.link(self.volume_element)
-        self.volume_element.link(scaletempo)
+        resample.link(volume_element)
+        volume_element.link(scaletempo)
         scaletempo.link(sink)
 
-        self.apad = convert.get_static_pad('sink')
-
-        bus = self.pipeline.get_bus()
+        # Messages of the standby pipeline are ignored by on_message until
+        # it becomes the current one
+        bus = pipeline.get_bus()
         bus.add_signal_watch()
         bus.connect('message', self.on_message)
+        return pipeline, audiosrc, volume_element, apad
 
     @property
     def filename(self) -> str:
         """Return the filename of the current stream."""
-        return str(self.audiosrc.get_property('location'))
+        return str(self._filepath)
 
     @property
     def duration(self) -> int:
         """Return the duration of the current stream."""
         success = False
         if self._duration is None or self._message_type == Gst.MessageType.DURATION_CHANGED:
-            success, self._duration = self.pipeline.query_duration(Gst.Format.TIME)
+            with tracing.span('duration_query'):
+                success, self._duration = self.pipeline.query_duration(Gst.Format.TIME)
             if not success:
                 self._duration = 0
             logger.debug('Query was successful: %s, Duration is: "%s"',
                          success, self._duration)
         return self._duration
 
-    def _get_position(self) -> int:
-        """Return the position of the current stream."""
-        # Sometimes querying the position does not work on the first try
-        pos = [0]
-        while pos[0] == 0:
-            pos = self.pipeline.query_position(Gst.Format.TIME)
-        return pos[1]
+    def _get_position(self) -> int | None:
+        """
+        Return the position of the current stream.
+
+        Sometimes querying the position does not work on the first try, so
+        retry a few times. If it still fails, extrapolate from the last known
+        position. Return None if the position is unknown.
+        """
+        if self._pending_seek is not None:
+            return self._pending_seek[0]
+        if self._resume_at is not None:
+            assert self._replayer is not None
+            position = self._replayer.position
+            return position if position is not None else self._replay_from
+        for _ in range(POSITION_RETRIES):
+            success, position = self.pipeline.query_position(Gst.Format.TIME)
+            if success:
+                self._remember_position(position)
+                return int(position)
+        logger.debug('Position query failed, using last known position')
+        tracing.count('position.extrapolated')
+        return self._extrapolate_position()
+
+    def _remember_position(self, position: int) -> None:
+        """Cache the given position together with the current clock time."""
+        self._last_position = position
+        self._last_clock = None
+        clock = self.pipeline.get_clock()
+        if clock is not None and self.playing:
+            self._last_clock = clock.get_time()
+
+    def _extrapolate_position(self) -> int | None:
+        """Estimate the position from the last known one and the clock."""
+        if self._last_position is None:
+            return None
+        clock = self.pipeline.get_clock()
+        if self._last_clock is None or clock is None or not self.playing:
+            return self._last_position
+        elapsed = clock.get_time() - self._last_clock
+        position = self._last_position + int(elapsed * self._rate)
+        if self._duration:
+            position = min(position, self._duration)
+        return position
 
     def _set_position(self, position: int) -> None:
         """Set the position of the current stream."""
+        self.seek(position)
+
+    position = property(_get_position, _set_position)
+
+    def seek(self, position: int, accurate: bool = True) -> None:
+        """
+        Seek to the given position.
+
+        'accurate' seeks land exactly on the position, others on the nearest
+        keyframe. A burst of seeks, e.g. from dragging the slider or holding
+        a key, only runs the first and the last one.
+        """
+        position = int(position)
+        # Armed again once the seek is done
+        self._cancel_skip()
+        if self._replay_jump(position):
+            return
+        if self._stop_replay():
+            self.state = Gst.State.PLAYING
+        flags = ACCURATE_SEEK if accurate else FAST_SEEK
+        self._remember_position(position)
+        if self._seek_id is not None:
+            if self._pending_seek is not None:
+                tracing.count('seek.coalesced')
+            self._pending_seek = (position, flags)
+            return
+        self._send_seek(position, flags)
+        self._seek_id = GLib.timeout_add(SEEK_INTERVAL, self._on_seek_timeout)
+
+    def _on_seek_timeout(self) -> bool:
+        """Run the last seek requested during the interval, if any."""
+        if self._pending_seek is None:
+            self._seek_id = None
+            return False
+        position, flags = self._pending_seek
+        self._pending_seek = None
+        self._send_seek(position, flags)
+        return True
+
+    def _cancel_seek(self) -> None:
+        """Forget a pending seek, e.g. because another file is opened."""
+        if self._seek_id is not None:
+            GLib.source_remove(self._seek_id)
+            self._seek_id = None
+        self._pending_seek = None
+
+    def _send_seek(self, position: int, flags: Gst.SeekFlags) -> None:
+        stop_type, stop = Gst.SeekType.NONE, -1
+        if self._loop is not None and position < self._loop[1]:
+            # Play up to the end of the loop and post SEGMENT_DONE there
+            flags |= Gst.SeekFlags.SEGMENT
+            stop_type, stop = Gst.SeekType.SET, self._loop[1]
         seek_event = Gst.Event.new_seek(
             self._rate,
             Gst.Format.TIME,
-            Gst.SeekFlags.FLUSH,
+            flags,
             Gst.SeekType.SET, position,
-            Gst.SeekType.NONE, -1
+            stop_type, stop
         )
-        self.pipeline.send_event(seek_event)
+        self._seek_start = tracing.start_span()
+        self._seek_target = position
+        if not self.pipeline.send_event(seek_event):
+            logger.debug('Seek to %d failed', position)
+            self._seek_start = None
+            self._seek_target = None
+
+    def _get_speech(self) -> Speech | None:
+        """Get the utterances whose gaps are skipped while playing."""
+        return self._speech
+
+    def _set_speech(self, speech: Speech | None) -> None:
+        """Skip the silence between the given utterances, None disables it."""
+        self._speech = speech
+        self._schedule_skip()
+
+    speech = property(_get_speech, _set_speech)
+
+    def _schedule_skip(self, playing: bool | None = None,
+                       position: int | None = None) -> None:
+        """
+        Arm the timer for the end of the current utterance.
 
-    position = property(_get_position, _set_position)
+        Silence is skipped right away, so call this whenever the position,
+        rate or play state changes. 'playing' and 'position' override the
+        queried ones for changes which are still in progress.
+        """
+        self._cancel_skip()
+        if playing is None:
+            playing = self.playing
+        if self._speech is None or not playing:
+            return
+        if position is None:
+            position = self.position
+        if position is None:
+            return
+        target = self._speech.skip_target(position)
+        if target is not None:
+            # Don't skip out of the A-B loop
+            if self._loop is None or target < self._loop[1]:
+                logger.debug('Skipping silence to %d', target)
+                self.seek(target)
+            return
+        end = self._speech.end_of(position)
+        if end is not None:
+            delay = int((end - position) / self._rate / Gst.MSECOND)
+            self._skip_id = GLib.timeout_add(max(delay, 1), self._on_skip_timeout)
+
+    def _on_skip_timeout(self) -> bool:
+        """Skip the silence after the utterance which just ended."""
+        self._skip_id = None
+        self._schedule_skip()
+        return False
+
+    def _cancel_skip(self) -> None:
+        if self._skip_id is not None:
+            GLib.source_remove(self._skip_id)
+            self._skip_id = None
+
+    @property
+    def loop(self) -> tuple[int, int] | None:
+        """Return start and end of the A-B loop, if any."""
+        return self._loop
+
+    def set_loop(self, start: int, end: int, jump: bool = False) -> None:
+        """
+        Loop playback between 'start' and 'end' ns.
+
+        The loop is played with segment seeks, which continue at the start
+        without flushing once the end is reached. If 'jump' is True playback
+        continues at the start, otherwise it reaches the loop as usual.
+        """
+        logger.debug('Looping from %d to %d', start, end)
+        self._loop = (start, end)
+        position = start if jump else self.position
+        if position is None or position >= end:
+            return
+        resume = self._stop_replay()
+        self._cancel_seek()
+        self._send_seek(position, ACCURATE_SEEK)
+        if resume:
+            self.state = Gst.State.PLAYING
+
+    def clear_loop(self) -> None:
+        """
+        Stop looping.
+
+        Playback continues past the end of the loop, no seek is needed for
+        that, see on_message().
+        """
+        self._loop = None
+
+    def _get_replay_budget(self) -> int:
+        """Get the memory for replays in bytes."""
+        return self._ring.budget
+
+    def _set_replay_budget(self, budget: int) -> None:
+        """Set the memory for replays in bytes, 0 disables them."""
+        if budget > 0 and self._replayer is None:
+            replayer = Replayer()
+            if not replayer.supported:
+                logger.debug('Replaying from memory needs GStreamer 1.18')
+                return
+            replayer.connect('finished', self.on_replay_finished)
+            self._replayer = replayer
+        self._ring.budget = max(budget, 0)
+        if budget <= 0:
+            if self._stop_replay():
+                self.state = Gst.State.PLAYING
+            self._ring.clear()
+
+    replay_budget = property(_get_replay_budget, _set_replay_budget)
+
+    def _replay_jump(self, position: int) -> bool:
+        """
+        Replay from memory instead of seeking back, if possible.
+
+        The pipeline stays paused where playback was and continues from there
+        once the replay reached that point, so neither is flushed.
+
+        :Return:
+            - If the jump is handled by a replay.
+        """
+        if self._replayer is None or self._ring.budget <= 0 or \
+                self._opening is not None or self._switching is not None or \
+                self._pending_seek is not None:
+            return False
+        if self._resume_at is None:
+            success, current = self.pipeline.query_position(Gst.Format.TIME)
+            if not success or position >= current:
+                return False
+            end = current
+        else:
+            end = self._resume_at
+            current = self._replayer.position
+            if current is None:
+                current = self._replay_from
+            if position == current and not self._replayer.playing:
+                # E.g. the position set again before resuming
+                return True
+            if position >= end:
+                return False
+        if not self._ring.covers(position, end):
+            self._ring.miss()
+            tracing.count('replay.miss')
+            return False
+        self._ring.hit()
+        tracing.count('replay.hit')
+        if self._resume_at is None:
+            playing = self.playing
+            self.pipeline.set_state(Gst.State.PAUSED)
+            # Take the position once the pipeline stopped
+            success, current = self.pipeline.query_position(Gst.Format.TIME)
+            if success and current > position:
+                end = current
+            self._resume_at = end
+        else:
+            playing = self._replayer.playing
+        self._start_replay(position, playing)
+        self._schedule_skip(position=position)
+        self.emit('seeked', position)
+        return True
+
+    def _start_replay(self, position: int, playing: bool) -> None:
+        assert self._replayer is not None and self._resume_at is not None
+        assert self._ring.caps is not None
+        self._replay_from = position
+        with tracing.span('replay'):
+            self._replayer.start(self._ring.caps,
+                                 self._ring.slice(position, self._resume_at),
+                                 position, self._resume_at, self._rate,
+                                 self.volume, playing)
+
+    def _stop_replay(self) -> bool:
+        """
+        Stop replaying, the pipeline stays paused.
+
+        :Return:
+            - If the replay was playing.
+        """
+        if self._resume_at is None:
+            return False
+        assert self._replayer is not None
+        playing = self._replayer.playing
+        self._replayer.stop()
+        self._resume_at = None
+        self._replay_from = None
+        return playing
+
+    # pylint: disable=unused-argument
+    def on_replay_finished(self, replayer: Replayer) -> None:
+        """Continue playing where the replay ended."""
+        if self._stop_replay():
+            self._last_clock = None
+            self.state = Gst.State.PLAYING
+            self._schedule_skip(True)
+
+    def _reset_ring(self) -> None:
+        """Start the replay buffer over, e.g. for another file."""
+        self._stop_replay()
+        self._ring.clear()
+        caps = self.volume_element.get_static_pad('sink').get_current_caps()
+        if caps is not None:
+            self._ring.set_caps(caps)
+
+    # pylint: disable=unused-argument
+    def _on_pcm_probe(self, pad: Gst.Pad, info: Gst.PadProbeInfo,
+                      volume_element: Gst.Element) -> Gst.PadProbeReturn:
+        """Streaming thread: keep the decoded audio for replays."""
+        if volume_element != self.volume_element:
+            # Standby pipeline
+            return Gst.PadProbeReturn.OK
+        if info.type & Gst.PadProbeType.BUFFER:
+            self._ring.append(info.get_buffer())
+            return Gst.PadProbeReturn.OK
+        event = info.get_event()
+        if event.type == Gst.EventType.CAPS:
+            self._ring.set_caps(event.parse_caps())
+        elif event.type in (Gst.EventType.FLUSH_STOP, Gst.EventType.SEGMENT):
+            # The stream continues elsewhere
+            self._ring.clear()
+        return Gst.PadProbeReturn.OK
 
     @property
     def playing(self) -> bool:
         """Return if pipeline is currently playing."""
+        if self._resume_at is not None:
+            assert self._replayer is not None
+            return self._replayer.playing
         return bool(Gst.State.PLAYING == self.state)
 
     def _get_rate(self) -> float:
@@ -124,19 +502,36 @@ class gTranscribePlayer(Gst.Bin):
         return self._rate
 
     def _set_rate(self, rate: float) -> None:
-        """Set the playback speed of the current stream."""
+        """
+        Set the playback speed of the current stream.
+
+        Where the pipeline supports it the rate changes in place, otherwise
+        the stream is flushed and seeked to the current position.
+        """
+        # Position query was not successful, use 0
+        position = self.position or 0
         self._rate = rate
-        pos = self.pipeline.query_position(Gst.Format.TIME)
-        # Position query was not successful, use current position or 0
-        position = pos[1] if pos[0] else 0
-        seek_event = Gst.Event.new_seek(
-            rate,
-            Gst.Format.TIME,
-            Gst.SeekFlags.FLUSH,
-            Gst.SeekType.SET, position,
-            Gst.SeekType.NONE, -1
-        )
-        self.pipeline.send_event(seek_event)
+        self._schedule_skip()
+        if self._resume_at is not None:
+            self._start_replay(position, self.playing)
+            # The paused pipeline gets the new rate for when it continues
+            position = self._resume_at
+        if self._pending_seek is not None:
+            # The pending seek picks up the new rate
+            return
+        self._remember_position(position)
+        if hasattr(Gst.SeekFlags, 'INSTANT_RATE_CHANGE'):
+            instant = Gst.Event.new_seek(
+                rate,
+                Gst.Format.TIME,
+                Gst.SeekFlags.INSTANT_RATE_CHANGE,
+                Gst.SeekType.NONE, -1,
+                Gst.SeekType.NONE, -1
+            )
+            if self.pipeline.send_event(instant):
+                return
+            logger.debug('Instant rate change not supported, seeking')
+        self._send_seek(position, ACCURATE_SEEK)
 
     rate = property(_get_rate, _set_rate)
 
@@ -158,11 +553,13 @@ class gTranscribePlayer(Gst.Bin):
     def _set_volume(self, volume: float) -> None:
         """Set the volume of the current stream."""
         self.volume_element.set_property('volume', volume)
+        if self._replayer is not None:
+            self._replayer.set_volume(volume)
 
     volume = property(_get_volume, _set_volume)
 
     # pylint: disable=unused-argument
-    def on_new_decoded_pad(self, element: Gst.Element, pad: Gst.Pad) -> None:
+    def on_new_decoded_pad(self, element: Gst.Element, pad: Gst.Pad, apad: Gst.Pad) -> None:
         """
         Handle new decoded pad from decodebin.
 
@@ -171,54 +568,306 @@ class gTranscribePlayer(Gst.Bin):
         """
         caps = pad.query_caps(None).to_string()
         if caps.startswith('audio/'):
-            if not self.apad.is_linked():
-                pad.link(self.apad)
-            self.emit('ready', self.filename)
+            if not apad.is_linked():
+                pad.link(apad)
 
     # pylint: disable=unused-argument
     def on_message(self, bus: Gst.Bus, message: Gst.Message) -> None:
         """Handle message and react accordingly."""
+        if bus != self.pipeline.get_bus():
+            # Message of the standby pipeline
+            if message.type == Gst.MessageType.ERROR:
+                logger.debug('Standby pipeline failed: %s', message.parse_error()[0])
+                self.discard_standby()
+            return
         self._message_type = message.type
         if message.type == Gst.MessageType.EOS:
-            self.state = Gst.State.NULL
+            # Keep the pipeline, reset() rewinds it
             self.emit('ended')
         elif message.type == Gst.MessageType.ERROR:
             logger.debug("%s", print(message.parse_error()))
             self.state = Gst.State.NULL
         elif message.type == Gst.MessageType.DURATION_CHANGED:
             self.emit('duration_changed')
+        elif message.type == Gst.MessageType.SEGMENT_DONE:
+            self._on_segment_done(message.parse_segment_done()[1])
+        elif message.type == Gst.MessageType.ASYNC_DONE:
+            if self._seek_start is not None:
+                # The pipeline prerolled at the new position
+                tracing.finish_span('seek', self._seek_start)
+                self._seek_start = None
+            if self._seek_target is not None:
+                target = self._seek_target
+                self._seek_target = None
+                # Only announce where a burst of seeks ends
+                if self._pending_seek is None:
+                    self._schedule_skip(position=target)
+                    self.emit('seeked', target)
+            self._on_prerolled()
+
+    def _on_segment_done(self, position: int) -> None:
+        """
+        Queue the next segment when the current one is played out.
+
+        Seeks without FLUSH take effect seamlessly where the last segment
+        ends, so the loop starts over without a gap or preroll.
+        """
+        if self._loop is None:
+            # The loop was cleared, continue to the end of the file
+            self.pipeline.send_event(Gst.Event.new_seek(
+                self._rate, Gst.Format.TIME, Gst.SeekFlags.ACCURATE,
+                Gst.SeekType.SET, position, Gst.SeekType.NONE, -1))
+            return
+        start, end = self._loop
+        tracing.count('loop.repeated')
+        self.pipeline.send_event(Gst.Event.new_seek(
+            self._rate, Gst.Format.TIME,
+            Gst.SeekFlags.SEGMENT | Gst.SeekFlags.ACCURATE,
+            Gst.SeekType.SET, start, Gst.SeekType.SET, end))
+        self._remember_position(start)
+        self._schedule_skip(position=start)
+        self.emit('seeked', start)
+
+    def _on_prerolled(self) -> None:
+        """Announce the file being opened once it is prerolled."""
+        if self._switching is not None:
+            position, playing = self._switching
+            self._switching = None
+            logger.debug('Continuing from proxy "%s"',
+                         self.audiosrc.get_property('location'))
+            self._send_seek(position, ACCURATE_SEEK)
+            if playing:
+                self.state = Gst.State.PLAYING
+            return
+        if self._opening is not None and self._opening == self.filename:
+            logger.debug('Prerolled file "%s"', self._opening)
+            tracing.finish_span('preroll', self._open_start, file=self._opening)
+            self._open_start = None
+            self._opening = None
+            # A new stream starts with normal speed
+            if self._rate != 1:
+                self.rate = self._rate
+            self.emit('ready', self.filename)
+            self.emit('duration_changed')
 
     def open(self, filepath: str, duration: bool = True) -> None:
-        """Open audio file and optionally query duration."""
+        """
+        Open audio file and optionally query duration.
+
+        This only starts prerolling the file, 'ready' is emitted once it is
+        done. Opening another file before that aborts the preroll.
+        """
         logger.debug('Opening file "%s"', filepath)
-        self.state = Gst.State.READY
-        self.audiosrc.set_property('location', filepath)
         if duration:
             self._duration = None
-        # Force decoding of file so we have a duration
-        self.state = Gst.State.PLAYING
-        self.pipeline.get_state(Gst.CLOCK_TIME_NONE)  # Wait for state change
+        self._cancel_seek()
+        self._cancel_skip()
+        self._speech = None
+        self._last_position = None
+        self._switching = None
+        self._loop = None
+        self._filepath = filepath
+        self._opening = filepath
+        self._open_start = tracing.start_span()
+        self._seek_start = None
+        self._seek_target = None
+        self._reset_ring()
+        if self._standby is not None and \
+                self._standby[1].get_property('location') == filepath:
+            self._use_standby()
+            return
+        # Don't use self.state here, a preroll in progress is still in READY
+        # but has to be aborted as well
+        self.pipeline.set_state(Gst.State.READY)
+        self.audiosrc.set_property('location', filepath)
         self.state = Gst.State.PAUSED
-        self.pipeline.get_state(Gst.CLOCK_TIME_NONE)  # Wait for state change
+
+    def use_proxy(self, proxy: str) -> None:
+        """
+        Play the current file from the given decoded copy.
+
+        Position, speed and play state are kept.
+        """
+        if self.audiosrc.get_property('location') == proxy:
+            return
+        logger.debug('Switching to proxy "%s"', proxy)
+        if self._opening is None:
+            position = self.position
+            self._switching = (position or 0, self.playing)
+        self._cancel_seek()
+        self._reset_ring()
+        self.pipeline.set_state(Gst.State.READY)
+        self.audiosrc.set_property('location', proxy)
+        self.pipeline.set_state(Gst.State.PAUSED)
+
+    def prepare(self, filepath: str) -> None:
+        """
+        Preroll the given file in a standby pipeline.
+
+        Opening the file afterwards just switches to that pipeline.
+        """
+        if self._standby is not None:
+            if self._standby[1].get_property('location') == filepath:
+                return
+            self.discard_standby()
+        logger.debug('Preparing file "%s"', filepath)
+        self._standby = self._build_pipeline()
+        self._standby[1].set_property('location', filepath)
+        self._standby[0].set_state(Gst.State.PAUSED)
+
+    def discard_standby(self) -> None:
+        """Throw away the standby pipeline."""
+        if self._standby is not None:
+            self._standby[0].set_state(Gst.State.NULL)
+            self._standby[0].get_bus().remove_signal_watch()
+            self._standby = None
+
+    def _use_standby(self) -> None:
+        """Make the standby pipeline the current one."""
+        assert self._standby is not None
+        volume = self.volume
+        self.pipeline.set_state(Gst.State.NULL)
+        self.pipeline.get_bus().remove_signal_watch()
+        self.pipeline, self.audiosrc, self.volume_element, self.apad = self._standby
+        self._standby = None
+        self.volume = volume
+        self._reset_ring()
+        # If the preroll already finished, its ASYNC_DONE has been ignored
+        result, state, _ = self.pipeline.get_state(0)
+        if result == Gst.StateChangeReturn.SUCCESS and state == Gst.State.PAUSED:
+            self._on_prerolled()
+
+    def wait(self, timeout: int = Gst.CLOCK_TIME_NONE) -> bool:
+        """
+        Block until a pending state change, e.g. a preroll, has finished.
+
+        Only meant for use without a main loop, e.g. for batch processing.
+        Return if the pipeline reached its target state.
+        """
+        result = self.pipeline.get_state(timeout)[0]
+        return bool(result == Gst.StateChangeReturn.SUCCESS)
 
     def reset(self) -> None:
-        """Reset the pipeline."""
+        """Rewind the current stream, e.g. after it ended."""
         logger.debug('Reset the pipeline')
-        self.state = Gst.State.NULL
-        filename = self.filename
-        self.init_pipeline()
-        self.open(filename, False)
+        self.state = Gst.State.PAUSED
+        self.position = 0
 
     def play(self) -> None:
         """Start playback from current position."""
-        self.state = Gst.State.PLAYING
+        # The cached clock time doesn't account for the time spent paused
+        self._last_clock = None
+        if self._replayer is not None and self._resume_at is not None:
+            self._replayer.play()
+        else:
+            self.state = Gst.State.PLAYING
+        self._schedule_skip(True)
 
     def pause(self) -> None:
         """Pause playback."""
+        self._last_clock = None
+        self._cancel_skip()
+        if self._replayer is not None and self._resume_at is not None:
+            self._replayer.pause()
+            return
         self.state = Gst.State.PAUSED
 
     def move_position(self, amount: int) -> None:
         """Move playback position."""
-        new_position = self.position + amount
+        position = self.position
+        if position is None:
+            logger.debug("Position unknown, can't move it")
+            return
+        new_position = position + amount
         # Clamp new_position between 0 and self.duration
         self.position = max(min(new_position, self.duration), 0)
+
+
+def decode_pcm(filepath: str, rate: int = 8000,
+               cancellable: Gio.Cancellable | None = None,
+               energies: array | None = None,
+               interval: int = 0) -> Iterator[bytes]:
+    """
+    Decode an audio file to mono samples in native 32 bit float format.
+
+    This uses the same decoding chain as gTranscribePlayer, but the samples
+    are pulled from an appsink as fast as possible instead of being played.
+    It blocks, so run it in a worker thread.
+
+    :Parameters:
+        - 'filepath': audio file to decode.
+        - 'rate': sample rate of the decoded samples.
+        - 'cancellable': raises GLib.Error once cancelled.
+        - 'energies': the mean square of the samples of each 'interval' ns
+          is appended to this while decoding. It is computed by GStreamer,
+          which is much faster than doing so in Python.
+
+    :Return:
+        - An iterator over chunks of raw samples.
+    """
+    init_gstreamer()
+    pipeline = Gst.Pipeline()
+    audiosrc = Gst.ElementFactory.make('filesrc', None)
+    audiosrc.set_property('location', filepath)
+    decoder = Gst.ElementFactory.make('decodebin', None)
+    convert = Gst.ElementFactory.make('audioconvert', None)
+    resample = Gst.ElementFactory.make('audioresample', None)
+    capsfilter = Gst.ElementFactory.make('capsfilter', None)
+    capsfilter.set_property('caps', Gst.Caps.from_string(
+        f'audio/x-raw,format=F32{"LE" if sys.byteorder == "little" else "BE"},'
+        f'channels=1,rate={rate}'))
+    sink = Gst.ElementFactory.make('appsink', None)
+    sink.set_property('sync', False)
+    elements = [audiosrc, decoder, convert, resample, capsfilter]
+    if energies is not None:
+        level = Gst.ElementFactory.make('level', None)
+        level.set_property('interval', interval)
+        level.set_property('post-messages', True)
+        elements.append(level)
+    elements.append(sink)
+
+    apad = convert.get_static_pad('sink')
+
+    def on_new_decoded_pad(element: Gst.Element, pad: Gst.Pad) -> None:
+        caps = pad.query_caps(None).to_string()
+        if caps.startswith('audio/') and not apad.is_linked():
+            pad.link(apad)
+
+    decoder.connect('pad-added', on_new_decoded_pad)
+    for element in elements:
+        pipeline.add(element)
+    audiosrc.link(decoder)
+    for first, second in zip(elements[2:], elements[3:]):
+        first.link(second)
+
+    bus = pipeline.get_bus()
+
+    def pop_messages() -> None:
+        while True:
+            message = bus.pop_filtered(Gst.MessageType.ERROR | Gst.MessageType.ELEMENT)
+            if message is None:
+                return
+            if message.type == Gst.MessageType.ERROR:
+                raise message.parse_error()[0]
+            structure = message.get_structure()
+            if energies is not None and structure is not None and \
+                    structure.get_name() == 'level':
+                # The RMS in dB of full scale, of the only channel
+                energies.append(10 ** (structure.get_value('rms')[0] / 10))
+
+    pipeline.set_state(Gst.State.PLAYING)
+    try:
+        while True:
+            if cancellable is not None:
+                cancellable.set_error_if_cancelled()
+            pop_messages()
+            sample = sink.emit('try-pull-sample', Gst.SECOND)
+            if sample is None:
+                if sink.get_property('eos'):
+                    pop_messages()
+                    return
+                continue
+            buf = sample.get_buffer()
+            yield buf.extract_dup(0, buf.get_size())
+    finally:
+        pipeline.set_state(Gst.State.NULL)
@@ -0,0 +1,157 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Queue of recordings to transcribe one after the other."""
+
+# pylint: disable=wrong-import-position
+import logging
+import threading
+from typing import NamedTuple
+import gi
+gi.require_version('Gst', '1.0')
+gi.require_version('GstPbutils', '1.0')
+from gi.repository import GLib, Gio, Gst, GstPbutils # NOQA: E402
+from gtranscribe.fingerprint import fingerprint_of_file # NOQA: E402
+from gtranscribe.metadata import transaction # NOQA: E402
+from gtranscribe.player import init_gstreamer # NOQA: E402
+logger = logging.getLogger('playlist')
+
+# Number of upcoming recordings prepared in the background
+PREPARE_AHEAD = 2
+# Nanoseconds to wait for the duration of a recording
+PROBE_TIMEOUT = 10 * Gst.SECOND
+
+
+class QueueItem(NamedTuple):
+    """A queued recording with its transcript and duration, if known."""
+
+    path: str
+    transcript: str | None
+    duration: int | None
+
+
+class WorkQueue():
+    """
+    Recordings to transcribe, stored in the meta data database.
+
+    Resume position and speed are kept per recording in the meta data as
+    usual, the queue adds the order and the transcript of each recording.
+    The next PREPARE_AHEAD recordings are fingerprinted and probed for their
+    duration in a worker thread, so switching to them is instant.
+    """
+
+    def __init__(self) -> None:
+        self._cancellable: Gio.Cancellable | None = None
+
+    def items(self) -> list[QueueItem]:
+        """Return all queued recordings in order."""
+        with transaction() as con:
+            rows = con.execute('SELECT path, transcript, duration FROM queue \
+                               ORDER BY seq').fetchall()
+        return [QueueItem(*row) for row in rows]
+
+    def item(self, path: str) -> QueueItem | None:
+        """Return the queue entry of the given recording, if any."""
+        with transaction() as con:
+            row = con.execute('SELECT path, transcript, duration FROM queue \
+                              WHERE path=?', (path,)).fetchone()
+        return QueueItem(*row) if row is not None else None
+
+    def add(self, paths: list[str]) -> None:
+        """Append recordings which are not queued yet."""
+        with transaction() as con:
+            seq = con.execute('SELECT COALESCE(MAX(seq), 0) FROM queue').fetchone()[0]
+            for path in paths:
+                seq += 1
+                con.execute('INSERT OR IGNORE INTO queue (path, seq) VALUES (?, ?)',
+                            (path, seq))
+        logger.debug('Queued %d recordings', len(paths))
+
+    def remove(self, path: str) -> None:
+        """Remove a recording from the queue."""
+        with transaction() as con:
+            con.execute('DELETE FROM queue WHERE path=?', (path,))
+
+    def clear(self) -> None:
+        """Remove all recordings from the queue."""
+        self.cancel()
+        with transaction() as con:
+            con.execute('DELETE FROM queue')
+
+    def link_transcript(self, path: str, transcript: str) -> None:
+        """Remember the transcript of a queued recording."""
+        with transaction() as con:
+            con.execute('UPDATE queue SET transcript=? WHERE path=?',
+                        (transcript, path))
+
+    def upcoming(self, path: str | None, count: int = 1) -> list[QueueItem]:
+        """
+        Return the recordings following the given one.
+
+        If 'path' is not queued, the queue starts from the beginning.
+        """
+        with transaction() as con:
+            row = con.execute('SELECT seq FROM queue WHERE path=?', (path,)).fetchone()
+            rows = con.execute('SELECT path, transcript, duration FROM queue \
+                               WHERE seq>? ORDER BY seq LIMIT ?',
+                               (row[0] if row is not None else 0, count)).fetchall()
+        return [QueueItem(*row) for row in rows]
+
+    def prepare(self, path: str | None) -> QueueItem | None:
+        """
+        Start preparing the recordings following the given one.
+
+        :Return:
+            - The next recording, if any.
+        """
+        self.cancel()
+        items = self.upcoming(path, PREPARE_AHEAD)
+        if not items:
+            return None
+        cancellable = Gio.Cancellable()
+        self._cancellable = cancellable
+        thread = threading.Thread(target=self._run, args=(items, cancellable),
+                                  name='gTranscribe queue', daemon=True)
+        thread.start()
+        return items[0]
+
+    def cancel(self) -> None:
+        """Stop preparing recordings."""
+        if self._cancellable is not None:
+            self._cancellable.cancel()
+            self._cancellable = None
+
+    @staticmethod
+    def _run(items: list[QueueItem], cancellable: Gio.Cancellable) -> None:
+        """Worker thread: fingerprint the recordings and probe their duration."""
+        init_gstreamer()
+        discoverer = None
+        for item in items:
+            if cancellable.is_cancelled():
+                return
+            try:
+                # The result is cached, so opening the file later is instant
+                fingerprint_of_file(item.path, cancellable=cancellable)
+                if item.duration is None:
+                    if discoverer is None:
+                        discoverer = GstPbutils.Discoverer.new(PROBE_TIMEOUT)
+                    info = discoverer.discover_uri(Gst.filename_to_uri(item.path))
+                    with transaction() as con:
+                        con.execute('UPDATE queue SET duration=? WHERE path=?',
+                                    (info.get_duration(), item.path))
+            except (GLib.Error, OSError) as error:
+                logger.debug('Could not prepare "%s": %s', item.path, error)
+                continue
+            logger.debug('Prepared "%s"', item.path)
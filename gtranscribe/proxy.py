@@ -0,0 +1,187 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Decoded copies of audio files which are cheap to seek in."""
+
+# pylint: disable=wrong-import-position
+import os
+import logging
+import tempfile
+import threading
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import GLib, GObject, Gio, Gst # NOQA: E402
+from gtranscribe.metadata import cache_dir # NOQA: E402
+from gtranscribe.player import init_gstreamer # NOQA: E402
+logger = logging.getLogger('proxy')
+
+proxy_dir = os.path.join(cache_dir, "proxies")
+
+# Proxies are 16 bit mono WAV files, plenty for speech and about 150 MB per
+# hour of audio
+PROXY_CAPS = 'audio/x-raw,format=S16LE,channels=1,rate=22050'
+# Files of these types are uncompressed already
+UNCOMPRESSED_TYPES = ('audio/x-wav', 'audio/wav', 'audio/vnd.wave', 'audio/x-aiff')
+
+
+def needs_proxy(filepath: str) -> bool:
+    """Return if decoding the given file is costly enough to use a proxy."""
+    content_type, _ = Gio.content_type_guess(filepath, None)
+    return not any(Gio.content_type_is_a(content_type, uncompressed)
+                   for uncompressed in UNCOMPRESSED_TYPES)
+
+
+def cached_proxy(fingerprint: str) -> str | None:
+    """Return the proxy of the given fingerprint and mark it as used."""
+    path = os.path.join(proxy_dir, fingerprint + '.wav')
+    try:
+        # The modification time records the last use for evict()
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def evict(budget: int, keep: str | None = None) -> None:
+    """
+    Delete the least recently used proxies until they fit into the budget.
+
+    :Parameters:
+        - 'budget': maximum total size in bytes.
+        - 'keep': proxy which is in use and must not be deleted.
+    """
+    proxies = []
+    try:
+        with os.scandir(proxy_dir) as entries:
+            for entry in entries:
+                # Hidden files are proxies still being built
+                if entry.name.endswith('.wav') and not entry.name.startswith('.') \
+                        and entry.path != keep:
+                    stat = entry.stat()
+                    proxies.append((stat.st_mtime, stat.st_size, entry.path))
+    except FileNotFoundError:
+        return
+    total = sum(size for _, size, _ in proxies)
+    if keep is not None and os.path.exists(keep):
+        total += os.path.getsize(keep)
+    for _, size, path in sorted(proxies):
+        if total <= budget:
+            break
+        logger.debug('Evicting proxy "%s"', path)
+        try:
+            os.unlink(path)
+        except OSError as e:
+            logger.warning('Could not delete proxy "%s": %s', path, e)
+            continue
+        total -= size
+
+
+def build_proxy(filepath: str, target: str,
+                cancellable: Gio.Cancellable | None = None) -> None:
+    """
+    Decode the given file into a WAV file.
+
+    This blocks, so run it in a worker thread. Raises GLib.Error on failure
+    or once cancelled.
+    """
+    init_gstreamer()
+    pipeline = Gst.parse_launch(
+        f'filesrc name=src ! decodebin ! audioconvert ! audioresample ! '
+        f'{PROXY_CAPS} ! wavenc ! filesink name=sink')
+    pipeline.get_by_name('src').set_property('location', filepath)
+    pipeline.get_by_name('sink').set_property('location', target)
+    bus = pipeline.get_bus()
+    pipeline.set_state(Gst.State.PLAYING)
+    try:
+        while True:
+            if cancellable is not None:
+                cancellable.set_error_if_cancelled()
+            message = bus.timed_pop_filtered(
+                100 * Gst.MSECOND, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+            if message is None:
+                continue
+            if message.type == Gst.MessageType.ERROR:
+                raise message.parse_error()[0]
+            return
+    finally:
+        pipeline.set_state(Gst.State.NULL)
+
+
+class ProxyBuilder(GObject.Object):
+    """
+    Build the proxy of an audio file in a worker thread.
+
+    'built' is emitted on the main loop with the path of the proxy. Starting
+    a new build cancels the previous one.
+    """
+
+    __gtype_name__ = 'gTranscribeProxyBuilder'
+
+    __gsignals__ = {
+        'built': (GObject.SignalFlags.RUN_LAST, None,
+                  (GObject.TYPE_STRING, GObject.TYPE_STRING))
+    }
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._cancellable: Gio.Cancellable | None = None
+
+    def build(self, filepath: str, fingerprint: str, budget: int) -> None:
+        """Start building the proxy and keep the cache within 'budget' bytes."""
+        self.cancel()
+        cancellable = Gio.Cancellable()
+        self._cancellable = cancellable
+        thread = threading.Thread(target=self._run,
+                                  args=(filepath, fingerprint, budget, cancellable),
+                                  name='gTranscribe proxy', daemon=True)
+        thread.start()
+
+    def cancel(self) -> None:
+        """Cancel the running build, if any."""
+        if self._cancellable is not None:
+            self._cancellable.cancel()
+            self._cancellable = None
+
+    def _run(self, filepath: str, fingerprint: str, budget: int,
+             cancellable: Gio.Cancellable) -> None:
+        """Worker thread: decode the file and make room for it."""
+        proxy = os.path.join(proxy_dir, fingerprint + '.wav')
+        logger.debug('Building proxy of "%s"', filepath)
+        temp = None
+        try:
+            os.makedirs(proxy_dir, exist_ok=True)
+            # Each build writes its own file, e.g. when another instance
+            # builds the same proxy
+            fd, temp = tempfile.mkstemp(dir=proxy_dir, prefix='.' + fingerprint,
+                                        suffix='.wav')
+            os.close(fd)
+            build_proxy(filepath, temp, cancellable)
+            os.replace(temp, proxy)
+        except (GLib.Error, OSError) as error:
+            logger.debug('Building proxy stopped: %s', error)
+            if temp is not None:
+                try:
+                    os.unlink(temp)
+                except OSError:
+                    pass
+            return
+        evict(budget, keep=proxy)
+        GLib.idle_add(self._emit, cancellable, filepath, proxy)
+
+    def _emit(self, cancellable: Gio.Cancellable, filepath: str, proxy: str) -> bool:
+        """Emit 'built' on the main loop unless the build was cancelled."""
+        if not cancellable.is_cancelled():
+            self.emit('built', filepath, proxy)
+        return False
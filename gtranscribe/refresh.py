@@ -0,0 +1,98 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Refresh widgets in step with the frame clock."""
+
+# pylint: disable=wrong-import-position
+import logging
+from collections.abc import Callable
+import gi
+gi.require_version('Gtk', '4.0')
+from gi.repository import GLib, Gdk, Gtk # NOQA: E402
+from gtranscribe import tracing # NOQA: E402
+logger = logging.getLogger('refresh')
+
+# Minimum time between two refreshes in microseconds
+ACTIVE_INTERVAL = 50000
+INACTIVE_INTERVAL = 250000
+
+
+class RefreshScheduler():
+    """
+    Call a refresh function from the tick callback of a widget.
+
+    Refreshes happen at most every ACTIVE_INTERVAL while the window has the
+    focus and every INACTIVE_INTERVAL otherwise. GTK doesn't run tick
+    callbacks at all while the widget isn't mapped, e.g. in a minimized
+    window. The refresh function returns False to stop the scheduler, like
+    a GLib source callback.
+
+    The scheduler also counts how many widget updates were issued or skipped
+    because nothing visible changed, see count().
+    """
+
+    def __init__(self, widget: Gtk.Widget, refresh: Callable[[], bool]) -> None:
+        self.widget = widget
+        self.refresh = refresh
+        self.issued = 0
+        self.skipped = 0
+        self._tick_id: int | None = None
+        self._last_frame_time = 0
+
+    @property
+    def running(self) -> bool:
+        """Return if the scheduler is running."""
+        return self._tick_id is not None
+
+    def start(self) -> None:
+        """Start calling the refresh function."""
+        if self._tick_id is None:
+            self._last_frame_time = 0
+            self._tick_id = self.widget.add_tick_callback(self.on_tick)
+
+    def stop(self) -> None:
+        """Stop calling the refresh function."""
+        if self._tick_id is not None:
+            self.widget.remove_tick_callback(self._tick_id)
+            self._tick_id = None
+            logger.debug('Widget updates issued: %d, skipped: %d',
+                         self.issued, self.skipped)
+
+    def count(self, issued: bool) -> bool:
+        """Count a widget update as issued or skipped and return 'issued'."""
+        if issued:
+            self.issued += 1
+            tracing.count('ui.updates_issued')
+        else:
+            self.skipped += 1
+            tracing.count('ui.updates_skipped')
+        return issued
+
+    # pylint: disable=unused-argument
+    def on_tick(self, widget: Gtk.Widget, frame_clock: Gdk.FrameClock) -> bool:
+        """Refresh if enough time has passed since the last refresh."""
+        frame_time = frame_clock.get_frame_time()
+        root = widget.get_root()
+        active = isinstance(root, Gtk.Window) and root.is_active()
+        interval = ACTIVE_INTERVAL if active else INACTIVE_INTERVAL
+        if frame_time - self._last_frame_time < interval:
+            return GLib.SOURCE_CONTINUE
+        self._last_frame_time = frame_time
+        with tracing.span('ui_tick'):
+            keep_running = self.refresh()
+        if not keep_running:
+            self._tick_id = None
+            return GLib.SOURCE_REMOVE
+        return GLib.SOURCE_CONTINUE
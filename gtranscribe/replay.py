@@ -0,0 +1,207 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Replay the last seconds of audio from memory."""
+
+# pylint: disable=wrong-import-position
+import logging
+import threading
+from collections import deque
+import gi
+gi.require_version('Gst', '1.0')
+gi.require_version('GstAudio', '1.0')
+from gi.repository import GObject, Gst, GstAudio # NOQA: E402
+logger = logging.getLogger('replay')
+
+# Buffers closer than this many ns are considered contiguous
+MAX_GAP = 5 * Gst.MSECOND
+
+
+class ReplayBuffer():
+    """
+    Ring of the decoded audio buffers played last, bounded by a byte budget.
+
+    Buffers are appended from the streaming thread. A gap in the timestamps,
+    e.g. after a seek, or new caps start the ring over, so it always holds
+    one contiguous stretch of audio.
+    """
+
+    def __init__(self, budget: int = 0) -> None:
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._buffers: deque[tuple[int, int, bytes]] = deque()
+        self._size = 0
+        self._caps: Gst.Caps | None = None
+        self._bytes_per_second = 0
+
+    @property
+    def caps(self) -> Gst.Caps | None:
+        """Return the caps of the buffered audio."""
+        return self._caps
+
+    def set_caps(self, caps: Gst.Caps) -> None:
+        """Use the given caps for the following buffers."""
+        with self._lock:
+            if self._caps is not None and self._caps.is_equal(caps):
+                return
+            self._clear()
+            self._caps = caps
+            info = GstAudio.AudioInfo.new_from_caps(caps)
+            self._bytes_per_second = info.bpf * info.rate if info is not None else 0
+
+    def clear(self) -> None:
+        """Forget all buffers."""
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        self._buffers.clear()
+        self._size = 0
+
+    def append(self, buffer: Gst.Buffer) -> None:
+        """Add a buffer and drop the oldest ones to stay within the budget."""
+        if self.budget <= 0 or self._bytes_per_second == 0 or \
+                buffer.pts == Gst.CLOCK_TIME_NONE:
+            return
+        data = buffer.extract_dup(0, buffer.get_size())
+        duration = buffer.duration
+        if duration == Gst.CLOCK_TIME_NONE:
+            duration = len(data) * Gst.SECOND // self._bytes_per_second
+        with self._lock:
+            if self._buffers:
+                pts, last_duration, _ = self._buffers[-1]
+                if abs(buffer.pts - (pts + last_duration)) > MAX_GAP:
+                    self._clear()
+            self._buffers.append((buffer.pts, duration, data))
+            self._size += len(data)
+            while self._size > self.budget:
+                self._size -= len(self._buffers.popleft()[2])
+
+    def covers(self, start: int, end: int) -> bool:
+        """Return if the audio between 'start' and 'end' ns is buffered."""
+        with self._lock:
+            if not self._buffers:
+                return False
+            first, _, _ = self._buffers[0]
+            last, duration, _ = self._buffers[-1]
+            return first <= start and end <= last + duration + MAX_GAP
+
+    def slice(self, start: int, end: int) -> list[tuple[int, int, bytes]]:
+        """Return the buffers overlapping the time between 'start' and 'end'."""
+        with self._lock:
+            return [(pts, duration, data) for pts, duration, data in self._buffers
+                    if pts + duration > start and pts < end]
+
+    def hit(self) -> None:
+        self.hits += 1
+        logger.debug('Replaying from memory (%d hits, %d misses)',
+                     self.hits, self.misses)
+
+    def miss(self) -> None:
+        self.misses += 1
+        logger.debug('Not in replay buffer (%d hits, %d misses)',
+                     self.hits, self.misses)
+
+
+class Replayer(GObject.Object):
+    """
+    Play a stretch of buffered audio.
+
+    The buffers are pushed into an appsrc with a segment carrying the speed
+    and the original positions, so scaletempo changes the speed as in the
+    main pipeline and the position is reported like there. 'finished' is
+    emitted on the main loop once the end of the stretch was played.
+    """
+
+    __gtype_name__ = 'gTranscribeReplayer'
+
+    __gsignals__ = {
+        'finished': (GObject.SignalFlags.RUN_LAST, None, ())
+    }
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.pipeline = Gst.parse_launch(
+            'appsrc name=src format=time max-bytes=0 ! audioconvert ! '
+            'audioresample ! volume name=volume ! scaletempo ! autoaudiosink')
+        self.src = self.pipeline.get_by_name('src')
+        self.volume_element = self.pipeline.get_by_name('volume')
+        # Older GStreamer versions ignore the segments of pushed samples
+        self.supported = self.src.find_property('handle-segment-change') is not None
+        if self.supported:
+            self.src.set_property('handle-segment-change', True)
+        bus = self.pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect('message', self.on_message)
+
+    @property
+    def active(self) -> bool:
+        """Return if a stretch is loaded."""
+        return bool(self.pipeline.get_state(0)[1] >= Gst.State.PAUSED)
+
+    @property
+    def playing(self) -> bool:
+        return bool(self.pipeline.get_state(0)[1] == Gst.State.PLAYING)
+
+    @property
+    def position(self) -> int | None:
+        """Return the position in the original stream."""
+        success, position = self.pipeline.query_position(Gst.Format.TIME)
+        return int(position) if success else None
+
+    def start(self, caps: Gst.Caps, buffers: list[tuple[int, int, bytes]],
+              start: int, end: int, rate: float, volume: float,
+              play: bool) -> None:
+        """Play the given buffers from 'start' to 'end' ns."""
+        self.pipeline.set_state(Gst.State.READY)
+        self.volume_element.set_property('volume', volume)
+        self.src.set_property('caps', caps)
+        segment = Gst.Segment()
+        segment.init(Gst.Format.TIME)
+        segment.do_seek(rate, Gst.Format.TIME, Gst.SeekFlags.NONE,
+                        Gst.SeekType.SET, start, Gst.SeekType.SET, end)
+        # appsrc only accepts data once it is started
+        self.pipeline.set_state(Gst.State.PAUSED)
+        for pts, duration, data in buffers:
+            buffer = Gst.Buffer.new_wrapped(data)
+            buffer.pts = pts
+            buffer.duration = duration
+            self.src.emit('push-sample', Gst.Sample.new(buffer, caps, segment, None))
+        self.src.emit('end-of-stream')
+        if play:
+            self.pipeline.set_state(Gst.State.PLAYING)
+
+    def play(self) -> None:
+        self.pipeline.set_state(Gst.State.PLAYING)
+
+    def pause(self) -> None:
+        self.pipeline.set_state(Gst.State.PAUSED)
+
+    def stop(self) -> None:
+        """Drop the loaded stretch."""
+        self.pipeline.set_state(Gst.State.READY)
+
+    def set_volume(self, volume: float) -> None:
+        self.volume_element.set_property('volume', volume)
+
+    # pylint: disable=unused-argument
+    def on_message(self, bus: Gst.Bus, message: Gst.Message) -> None:
+        if message.type == Gst.MessageType.EOS:
+            self.emit('finished')
+        elif message.type == Gst.MessageType.ERROR:
+            logger.debug('Replay failed: %s', message.parse_error()[0])
+            self.emit('finished')
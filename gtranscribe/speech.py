@@ -0,0 +1,138 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Split audio files into speech and silence."""
+
+import logging
+from array import array
+from bisect import bisect_left, bisect_right
+from gtranscribe.metadata import transaction
+logger = logging.getLogger('speech')
+
+# Length of the analysed frames, i.e. 20 ms
+FRAME_NS = 20000000
+# Frames whose energy exceeds the noise floor by this factor are speech, the
+# noise floor is the energy exceeded by all but NOISE_QUANTILE of the frames
+THRESHOLD_FACTOR = 6.0
+NOISE_QUANTILE = 0.1
+MIN_ENERGY = 1e-6
+# Pauses shorter than MIN_PAUSE frames belong to the utterance, bursts shorter
+# than MIN_SPEECH frames are noise, utterances are padded by PADDING frames
+MIN_PAUSE = 20
+MIN_SPEECH = 5
+PADDING = 5
+# Going to the previous utterance within this many ns after its start goes to
+# the one before, like the previous track button of a player
+RESTART_GRACE = 1000000000
+
+# Bump to invalidate cached segments after changing the parameters above
+VERSION = 1
+
+
+class Speech():
+    """Start and end positions in ns of the utterances in an audio file."""
+
+    def __init__(self, starts: array, ends: array) -> None:
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def skip_target(self, position: int) -> int | None:
+        """
+        Return where playback should continue to skip silence.
+
+        None means the position is within an utterance or behind the last one.
+        """
+        i = bisect_right(self.ends, position)
+        if i == len(self.starts) or self.starts[i] <= position:
+            return None
+        return int(self.starts[i])
+
+    def end_of(self, position: int) -> int | None:
+        """Return the end of the utterance the position is within, if any."""
+        i = bisect_right(self.ends, position)
+        if i == len(self.starts) or self.starts[i] > position:
+            return None
+        return int(self.ends[i])
+
+    def next_start(self, position: int) -> int | None:
+        """Return the start of the first utterance after the position."""
+        i = bisect_right(self.starts, position)
+        return int(self.starts[i]) if i < len(self.starts) else None
+
+    def previous_start(self, position: int) -> int | None:
+        """Return the start of the utterance before the position."""
+        i = bisect_left(self.starts, position - RESTART_GRACE)
+        return int(self.starts[i - 1]) if i > 0 else None
+
+    @classmethod
+    def analyze(cls, energies: array) -> 'Speech':
+        """Detect the utterances from the mean square of each frame."""
+        if not energies:
+            return cls(array('q'), array('q'))
+        floor = sorted(energies)[int(len(energies) * NOISE_QUANTILE)]
+        threshold = max(floor * THRESHOLD_FACTOR, MIN_ENERGY)
+        return cls.from_frames([energy > threshold for energy in energies])
+
+    @classmethod
+    def from_frames(cls, voiced: list[bool]) -> 'Speech':
+        """Turn per-frame speech decisions into padded utterances."""
+        runs: list[list[int]] = []
+        start = None
+        for i, is_speech in enumerate(voiced + [False]):
+            if is_speech and start is None:
+                start = i
+            elif not is_speech and start is not None:
+                if runs and start - runs[-1][1] < MIN_PAUSE:
+                    runs[-1][1] = i
+                else:
+                    runs.append([start, i])
+                start = None
+        starts = array('q')
+        ends = array('q')
+        for first, last in runs:
+            if last - first < MIN_SPEECH:
+                continue
+            first = max(0, first - PADDING)
+            last = min(len(voiced), last + PADDING)
+            if ends and first * FRAME_NS <= ends[-1]:
+                ends[-1] = last * FRAME_NS
+            else:
+                starts.append(first * FRAME_NS)
+                ends.append(last * FRAME_NS)
+        return cls(starts, ends)
+
+    @classmethod
+    def load(cls, fingerprint: str) -> 'Speech | None':
+        """Load the cached utterances for the given fingerprint, if any."""
+        with transaction() as con:
+            row = con.execute('SELECT segments FROM speech WHERE md5=? \
+                              AND version=?', (fingerprint, VERSION)).fetchone()
+        if row is None:
+            return None
+        segments = array('q')
+        segments.frombytes(row[0])
+        return cls(segments[0::2], segments[1::2])
+
+    def save(self, fingerprint: str) -> None:
+        """Store the utterances in the database."""
+        segments = array('q', (0,)) * (2 * len(self.starts))
+        segments[0::2] = self.starts
+        segments[1::2] = self.ends
+        with transaction() as con:
+            con.execute('INSERT OR REPLACE INTO speech (md5, version, segments) \
+                        VALUES (?, ?, ?)', (fingerprint, VERSION, segments.tobytes()))
@@ -0,0 +1,294 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Spell checking of the visible and edited parts of a transcript."""
+
+# pylint: disable=wrong-import-position
+import re
+import time
+import logging
+from gettext import gettext as _
+import gi
+gi.require_version('Gtk', '4.0')
+gi.require_version('Gdk', '4.0')
+gi.require_version('Spelling', '1')
+from gi.repository import GLib, Gio, Gdk, Gtk, Pango, Spelling # NOQA: E402
+from gtranscribe import tracing # NOQA: E402
+from gtranscribe.timestamps import TIMESTAMP_RE # NOQA: E402
+logger = logging.getLogger('spellcheck')
+
+WORD_RE = re.compile(r"\w+(?:['’]\w+)*")
+# Seconds of work per idle slice, well below the duration of a frame
+SLICE_BUDGET = 0.004
+# Lines above and below the visible ones which are checked as well
+MARGIN_LINES = 20
+# Edits which are remembered to be checked first, larger inserts like
+# loading a file are only checked once they become visible
+MAX_EDITS = 32
+MAX_EDIT_LENGTH = 1000
+MAX_SUGGESTIONS = 5
+
+
+class SpellChecker():
+    """
+    Check the spelling of a Gtk.TextView incrementally.
+
+    Checked lines carry an invisible tag. Lines touched by an edit lose it,
+    so only lines with untagged text need to be checked. Edited lines are
+    checked first, then those in or near the visible area, in idle slices
+    of at most SLICE_BUDGET seconds. The rest of the buffer is left alone
+    until it is scrolled into view. Timestamps and words with digits are
+    skipped. The language is taken from the 'spell-check-language' key of
+    'settings', the default language is used if it is empty.
+    """
+
+    def __init__(self, text_view: Gtk.TextView, settings: Gio.Settings) -> None:
+        self.text_view = text_view
+        self.text_buffer = text_view.get_buffer()
+        self.checker = Spelling.Checker.get_default()
+        self._default_language = self.checker.get_language()
+        self.set_language(settings.get_string('spell-check-language'))
+        settings.connect('changed::spell-check-language', self.on_language_changed)
+        self.languages = Gio.Menu()
+        languages = Spelling.Provider.get_default().list_languages()
+        for i in range(languages.get_n_items()):
+            language = languages.get_item(i)
+            item = Gio.MenuItem.new(language.get_name(), None)
+            item.set_action_and_target_value('spelling.spell-check-language',
+                                             GLib.Variant.new_string(language.get_code()))
+            self.languages.append_item(item)
+        self._checked_tag = self.text_buffer.create_tag(None)
+        self._misspelled_tag = self.text_buffer.create_tag(
+            None, underline=Pango.Underline.ERROR)
+        self._edits: list[Gtk.TextMark] = []
+        self._idle_id: int | None = None
+        # Misspelled word the context menu was opened on
+        self._menu_word: tuple[int, int, str] | None = None
+
+        self.text_buffer.connect_after('insert-text', self.on_insert_text)
+        self.text_buffer.connect_after('delete-range', self.on_range_deleted)
+        text_view.get_vadjustment().connect('value-changed', self.on_scrolled)
+        text_view.get_vadjustment().connect('changed', self.on_scrolled)
+
+        self.menu = Gio.Menu()
+        text_view.set_extra_menu(self.menu)
+        actions = Gio.SimpleActionGroup()
+        correct = Gio.SimpleAction.new('correct', GLib.VariantType.new('s'))
+        correct.connect('activate', self.on_correct)
+        actions.add_action(correct)
+        for name, callback in (('add', self.on_add), ('ignore', self.on_ignore)):
+            action = Gio.SimpleAction.new(name, None)
+            action.connect('activate', callback)
+            actions.add_action(action)
+        actions.add_action(settings.create_action('spell-check-language'))
+        text_view.insert_action_group('spelling', actions)
+        click = Gtk.GestureClick(button=Gdk.BUTTON_SECONDARY)
+        click.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
+        click.connect('pressed', self.on_secondary_click)
+        text_view.add_controller(click)
+        self.schedule()
+
+    def schedule(self) -> None:
+        """Check the pending lines once the main loop is idle."""
+        if self._idle_id is None:
+            self._idle_id = GLib.idle_add(self._run)
+
+    def set_language(self, code: str) -> None:
+        """Check in the given language, the default one if 'code' is empty."""
+        language = code or self._default_language
+        if language:
+            self.checker.set_language(language)
+
+    # pylint: disable=unused-argument
+    def on_language_changed(self, settings: Gio.Settings, key: str) -> None:
+        self.set_language(settings.get_string(key))
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Check all lines again, e.g. after the dictionary changed."""
+        modified = self.text_buffer.get_modified()
+        self.text_buffer.remove_tag(self._checked_tag, self.text_buffer.get_start_iter(),
+                                    self.text_buffer.get_end_iter())
+        self.text_buffer.set_modified(modified)
+        self.schedule()
+
+    # pylint: disable=unused-argument
+    def on_insert_text(self, text_buffer: Gtk.TextBuffer, location: Gtk.TextIter,
+                       text: str, length: int) -> None:
+        # Text inserted within a tagged range inherits the tag
+        start = text_buffer.get_iter_at_offset(location.get_offset() - len(text))
+        modified = text_buffer.get_modified()
+        text_buffer.remove_tag(self._checked_tag, self._line_bounds(start)[0],
+                               self._line_bounds(location)[1])
+        text_buffer.set_modified(modified)
+        if length <= MAX_EDIT_LENGTH:
+            self._edits.append(text_buffer.create_mark(None, location, True))
+            if len(self._edits) > MAX_EDITS:
+                text_buffer.delete_mark(self._edits.pop(0))
+        self.schedule()
+
+    # pylint: disable=unused-argument
+    def on_range_deleted(self, text_buffer: Gtk.TextBuffer, start: Gtk.TextIter,
+                         end: Gtk.TextIter) -> None:
+        # Words joined by the deletion have to be checked again
+        line_start, line_end = self._line_bounds(start)
+        modified = text_buffer.get_modified()
+        text_buffer.remove_tag(self._checked_tag, line_start, line_end)
+        text_buffer.set_modified(modified)
+        self._edits.append(text_buffer.create_mark(None, line_start, True))
+        if len(self._edits) > MAX_EDITS:
+            text_buffer.delete_mark(self._edits.pop(0))
+        self.schedule()
+
+    # pylint: disable=unused-argument
+    def on_scrolled(self, adjustment: Gtk.Adjustment) -> None:
+        self.schedule()
+
+    @staticmethod
+    def _line_bounds(location: Gtk.TextIter) -> tuple[Gtk.TextIter, Gtk.TextIter]:
+        """Return the start of the line and of the next line."""
+        start = location.copy()
+        start.set_line_offset(0)
+        end = start.copy()
+        end.forward_line()
+        return start, end
+
+    def _unchecked_in(self, start: Gtk.TextIter, end: Gtk.TextIter) -> Gtk.TextIter | None:
+        """Return the first unchecked character between 'start' and 'end'."""
+        if start.compare(end) >= 0:
+            return None
+        if not start.has_tag(self._checked_tag):
+            return start
+        location = start.copy()
+        if location.forward_to_tag_toggle(self._checked_tag) and \
+                location.compare(end) < 0:
+            return location
+        return None
+
+    def _next_line(self) -> Gtk.TextIter | None:
+        """Return a line which needs to be checked, edited lines first."""
+        while self._edits:
+            mark = self._edits.pop()
+            location = self.text_buffer.get_iter_at_mark(mark)
+            self.text_buffer.delete_mark(mark)
+            unchecked = self._unchecked_in(*self._line_bounds(location))
+            if unchecked is not None:
+                return unchecked
+        rect = self.text_view.get_visible_rect()
+        top = self.text_view.get_line_at_y(rect.y)[0]
+        top.backward_lines(MARGIN_LINES)
+        top.set_line_offset(0)
+        bottom = self.text_view.get_line_at_y(rect.y + rect.height)[0]
+        bottom.forward_lines(MARGIN_LINES + 1)
+        return self._unchecked_in(top, bottom)
+
+    def _run(self) -> bool:
+        """Check lines until the time budget of the slice is used up."""
+        deadline = time.perf_counter() + SLICE_BUDGET
+        # Tagging marks the buffer as modified, which is no real change
+        modified = self.text_buffer.get_modified()
+        with tracing.span('spellcheck'):
+            try:
+                while time.perf_counter() < deadline:
+                    location = self._next_line()
+                    if location is None:
+                        self._idle_id = None
+                        return False
+                    self._check_line(*self._line_bounds(location))
+            finally:
+                self.text_buffer.set_modified(modified)
+        return True
+
+    def _check_line(self, start: Gtk.TextIter, end: Gtk.TextIter) -> None:
+        text = self.text_buffer.get_text(start, end, True)
+        offset = start.get_offset()
+        timestamps = [match.span() for match in TIMESTAMP_RE.finditer(text)]
+        self.text_buffer.remove_tag(self._misspelled_tag, start, end)
+        for match in WORD_RE.finditer(text):
+            word = match.group()
+            if any(char.isdigit() for char in word) or \
+                    any(first <= match.start() < last for first, last in timestamps):
+                continue
+            if not self.checker.check_word(word, -1):
+                self.text_buffer.apply_tag(
+                    self._misspelled_tag,
+                    self.text_buffer.get_iter_at_offset(offset + match.start()),
+                    self.text_buffer.get_iter_at_offset(offset + match.end()))
+        self.text_buffer.apply_tag(self._checked_tag, start, end)
+
+    # pylint: disable=unused-argument
+    def on_secondary_click(self, gesture: Gtk.GestureClick, n_press: int,
+                           x: float, y: float) -> None:
+        """Offer corrections for the misspelled word under the pointer."""
+        self.menu.remove_all()
+        self._menu_word = None
+        languages = Gio.Menu()
+        languages.append_submenu(_('Languages'), self.languages)
+        self.menu.append_section(None, languages)
+        buffer_x, buffer_y = self.text_view.window_to_buffer_coords(
+            Gtk.TextWindowType.WIDGET, int(x), int(y))
+        found, location = self.text_view.get_iter_at_location(buffer_x, buffer_y)
+        if not found or not location.has_tag(self._misspelled_tag):
+            return
+        line_start, line_end = self._line_bounds(location)
+        text = self.text_buffer.get_text(line_start, line_end, True)
+        column = location.get_offset() - line_start.get_offset()
+        for match in WORD_RE.finditer(text):
+            if match.start() <= column < match.end():
+                start = line_start.get_offset() + match.start()
+                self._menu_word = (start, start + len(match.group()), match.group())
+                break
+        else:
+            return
+        word = self._menu_word[2]
+        suggestions = Gio.Menu()
+        for correction in (self.checker.list_corrections(word) or [])[:MAX_SUGGESTIONS]:
+            item = Gio.MenuItem.new(correction, None)
+            item.set_action_and_target_value('spelling.correct',
+                                             GLib.Variant.new_string(correction))
+            suggestions.append_item(item)
+        self.menu.insert_section(0, None, suggestions)
+        dictionary = Gio.Menu()
+        dictionary.append(_('Add to Dictionary'), 'spelling.add')
+        dictionary.append(_('Ignore'), 'spelling.ignore')
+        self.menu.insert_section(1, None, dictionary)
+
+    # pylint: disable=unused-argument
+    def on_correct(self, action: Gio.SimpleAction, parameter: GLib.Variant) -> None:
+        if self._menu_word is None:
+            return
+        start, end, word = self._menu_word
+        self._menu_word = None
+        start_iter = self.text_buffer.get_iter_at_offset(start)
+        end_iter = self.text_buffer.get_iter_at_offset(end)
+        if self.text_buffer.get_text(start_iter, end_iter, True) != word:
+            # The text changed since the menu was opened
+            return
+        self.text_buffer.begin_user_action()
+        self.text_buffer.delete(start_iter, end_iter)
+        self.text_buffer.insert(start_iter, parameter.get_string())
+        self.text_buffer.end_user_action()
+
+    # pylint: disable=unused-argument
+    def on_add(self, action: Gio.SimpleAction, parameter: GLib.Variant | None) -> None:
+        if self._menu_word is not None:
+            self.checker.add_word(self._menu_word[2])
+            self.invalidate()
+
+    # pylint: disable=unused-argument
+    def on_ignore(self, action: Gio.SimpleAction, parameter: GLib.Variant | None) -> None:
+        if self._menu_word is not None:
+            self.checker.ignore_word(self._menu_word[2])
+            self.invalidate()
@@ -0,0 +1,210 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Load and save transcripts in chunks without blocking the main loop."""
+
+# pylint: disable=wrong-import-position
+import os
+import codecs
+import shutil
+import logging
+import tempfile
+import threading
+import gi
+gi.require_version('Gtk', '4.0')
+from gi.repository import GLib, GObject, Gio, Gtk # NOQA: E402
+logger = logging.getLogger('textio')
+
+# Bytes read per chunk when loading
+CHUNK_SIZE = 65536
+
+
+class TextLoader(GObject.Object):
+    """
+    Read a text file into a Gtk.TextBuffer chunk by chunk.
+
+    The file is read asynchronously and every chunk is appended to the
+    buffer on its own, so the main loop keeps running in between. Loading
+    another file cancels the running load.
+    """
+
+    __gtype_name__ = 'gTranscribeTextLoader'
+
+    __gsignals__ = {
+        'finished': (GObject.SignalFlags.RUN_LAST, None, (GObject.TYPE_STRING,)),
+        'failed': (GObject.SignalFlags.RUN_LAST, None,
+                   (GObject.TYPE_STRING, GObject.TYPE_STRING))
+    }
+
+    def __init__(self, text_buffer: Gtk.TextBuffer) -> None:
+        super().__init__()
+        self.text_buffer = text_buffer
+        self._cancellable: Gio.Cancellable | None = None
+
+    @property
+    def loading(self) -> bool:
+        """Return if a file is being loaded."""
+        return self._cancellable is not None
+
+    def load(self, filepath: str) -> None:
+        """Replace the contents of the buffer with the given file."""
+        self.cancel()
+        self._cancellable = Gio.Cancellable()
+        file = Gio.File.new_for_path(filepath)
+        file.read_async(GLib.PRIORITY_DEFAULT, self._cancellable,
+                        self._on_opened, filepath)
+
+    def cancel(self) -> None:
+        """Cancel the running load, if any."""
+        if self._cancellable is not None:
+            self._cancellable.cancel()
+            self._cancellable = None
+            self.text_buffer.set_enable_undo(True)
+
+    def _on_opened(self, file: Gio.File, result: Gio.AsyncResult, filepath: str) -> None:
+        try:
+            stream = file.read_finish(result)
+        except GLib.Error as error:
+            self._fail(filepath, error)
+            return
+        # Loading a file shouldn't be undoable
+        self.text_buffer.set_enable_undo(False)
+        self.text_buffer.set_text('')
+        decoder = codecs.getincrementaldecoder('utf_8')()
+        self._read_next(stream, filepath, decoder)
+
+    def _read_next(self, stream: Gio.InputStream, filepath: str, decoder: codecs.IncrementalDecoder) -> None:
+        # Low priority, so drawing and input are handled between chunks
+        stream.read_bytes_async(CHUNK_SIZE, GLib.PRIORITY_DEFAULT_IDLE,
+                                self._cancellable, self._on_read,
+                                (filepath, decoder))
+
+    def _on_read(self, stream: Gio.InputStream, result: Gio.AsyncResult,
+                 data: tuple[str, codecs.IncrementalDecoder]) -> None:
+        filepath, decoder = data
+        try:
+            chunk = stream.read_bytes_finish(result).get_data()
+            text = decoder.decode(chunk, final=not chunk)
+        except (GLib.Error, UnicodeDecodeError) as error:
+            stream.close_async(GLib.PRIORITY_DEFAULT, None, None)
+            self._fail(filepath, error)
+            return
+        self.text_buffer.insert(self.text_buffer.get_end_iter(), text)
+        if chunk:
+            self._read_next(stream, filepath, decoder)
+            return
+        stream.close_async(GLib.PRIORITY_DEFAULT, None, None)
+        self._cancellable = None
+        self.text_buffer.set_enable_undo(True)
+        self.emit('finished', filepath)
+
+    def _fail(self, filepath: str, error: Exception) -> None:
+        """Report errors unless the load was cancelled."""
+        if isinstance(error, GLib.Error) and \
+                error.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CANCELLED):
+            return
+        logger.error('Could not load "%s": %s', filepath, error)
+        self._cancellable = None
+        self.text_buffer.set_enable_undo(True)
+        self.emit('failed', filepath, str(error))
+
+
+class TextSaver(GObject.Object):
+    """
+    Atomically save a Gtk.TextBuffer to a file.
+
+    The text is taken from the buffer right away, which is cheap compared
+    to writing it, and written to a temporary file by a worker thread,
+    which then replaces the target file. The buffer stays editable: edits
+    made while writing are not saved, but leave the buffer modified.
+    """
+
+    __gtype_name__ = 'gTranscribeTextSaver'
+
+    __gsignals__ = {
+        'saved': (GObject.SignalFlags.RUN_LAST, None, (GObject.TYPE_STRING,)),
+        'failed': (GObject.SignalFlags.RUN_LAST, None,
+                   (GObject.TYPE_STRING, GObject.TYPE_STRING))
+    }
+
+    def __init__(self, text_buffer: Gtk.TextBuffer) -> None:
+        super().__init__()
+        self.text_buffer = text_buffer
+        self._saving = False
+        # File to save again once the running save has finished
+        self._again: str | None = None
+
+    @property
+    def saving(self) -> bool:
+        """Return if a save is running."""
+        return self._saving
+
+    def save(self, filepath: str) -> None:
+        """Start saving the buffer to the given file."""
+        if self._saving:
+            self._again = filepath
+            return
+        self._saving = True
+        self.text_buffer.set_modified(False)
+        # A snapshot, copying in slices lost text moved across the copied part
+        text = self.text_buffer.get_text(self.text_buffer.get_start_iter(),
+                                         self.text_buffer.get_end_iter(), True)
+        thread = threading.Thread(target=self._write, args=(filepath, text),
+                                  name='gTranscribe saver', daemon=True)
+        thread.start()
+
+    def _write(self, filepath: str, text: str) -> None:
+        """Worker thread: write the text to a temporary file and rename it."""
+        directory, name = os.path.split(os.path.abspath(filepath))
+        try:
+            fd, tmp = tempfile.mkstemp(prefix=f'.{name}.', dir=directory)
+        except OSError as e:
+            GLib.idle_add(self._finish, filepath, str(e))
+            return
+        try:
+            with os.fdopen(fd, mode="w", encoding="utf_8") as fout:
+                fout.write(text)
+                fout.flush()
+                os.fsync(fout.fileno())
+            if os.path.exists(filepath):
+                shutil.copymode(filepath, tmp)
+            else:
+                # mkstemp only allows the owner to read the file
+                os.chmod(tmp, 0o644)
+            os.replace(tmp, filepath)
+        except OSError as e:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            GLib.idle_add(self._finish, filepath, str(e))
+            return
+        GLib.idle_add(self._finish, filepath, None)
+
+    def _finish(self, filepath: str, error: str | None) -> bool:
+        """Report the result on the main loop."""
+        self._saving = False
+        if error is None:
+            logger.debug('Saved "%s"', filepath)
+            self.emit('saved', filepath)
+        else:
+            logger.error('Could not save file %s: %s', filepath, error)
+            self.text_buffer.set_modified(True)
+            self.emit('failed', filepath, error)
+        if self._again is not None:
+            again = self._again
+            self._again = None
+            self.save(again)
+        return False
@@ -0,0 +1,176 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Index of the timestamp tags in a transcript."""
+
+import re
+import logging
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple, TYPE_CHECKING
+# Only the index needs Gtk, parsing works without GUI
+if TYPE_CHECKING:
+    from gi.repository import Gtk
+logger = logging.getLogger('timestamps')
+
+# Match both [HH:MM:SS.F] or [MM:SS.F] and #HH:MM:SS-F# or #MM:SS-F# formats
+TIMESTAMP_RE = re.compile(r'[\[#]((?:\d?\d:)?\d\d:\d\d(?:[-.]\d)?)[\]#]')
+
+
+class Timestamp(NamedTuple):
+    """A timestamp tag with its character offsets and value in nanoseconds."""
+
+    start: int
+    end: int
+    value: int
+
+
+def parse_timestamp(text: str) -> int:
+    """
+    Convert the time of a timestamp tag to nanoseconds.
+
+    :Parameters:
+        - 'text': time like '01:02:03.4', '02:03-4' or '02:03'.
+
+    :Return:
+        - Nanoseconds as int.
+    """
+    clock, _, fraction = text.replace('-', '.').partition('.')
+    seconds = 0
+    for part in clock.split(':'):
+        seconds = seconds * 60 + int(part)
+    ns = seconds * 1000000000
+    if fraction:
+        ns += int(fraction) * 10 ** (9 - len(fraction))
+    return ns
+
+
+class TimestampIndex():
+    """
+    Keep track of all timestamp tags in a Gtk.TextBuffer.
+
+    The index is updated incrementally from the buffer's insert and delete
+    signals, only the lines touched by an edit are searched again. Tags are
+    kept sorted by offset, so lookups are binary searches.
+    """
+
+    def __init__(self, text_buffer: 'Gtk.TextBuffer') -> None:
+        self.text_buffer = text_buffer
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        self._values: list[int] = []
+        # (value, index) pairs sorted by value, built on demand
+        self._by_value: list[tuple[int, int]] | None = None
+        self._deleting: tuple[int, int] | None = None
+        text_buffer.connect_after('insert-text', self.on_insert_text)
+        text_buffer.connect('delete-range', self.on_delete_range)
+        text_buffer.connect_after('delete-range', self.on_range_deleted)
+        self._rescan(0, text_buffer.get_char_count())
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def _get(self, i: int) -> Timestamp:
+        return Timestamp(self._starts[i], self._ends[i], self._values[i])
+
+    def before(self, offset: int) -> Timestamp | None:
+        """Return the last tag ending at or before the given offset."""
+        i = bisect_right(self._ends, offset)
+        return self._get(i - 1) if i > 0 else None
+
+    def after(self, offset: int) -> Timestamp | None:
+        """Return the first tag starting after the given offset."""
+        i = bisect_right(self._starts, offset)
+        return self._get(i) if i < len(self._starts) else None
+
+    def last(self) -> Timestamp | None:
+        """Return the last tag in the buffer."""
+        return self._get(len(self._starts) - 1) if self._starts else None
+
+    def values(self) -> list[int]:
+        """Return the positions of all tags in buffer order."""
+        return list(self._values)
+
+    def for_position(self, position: int) -> Timestamp | None:
+        """
+        Return the tag with the smallest value at or after the position.
+
+        Tags are inserted at the end of the transcribed passage, so this is
+        the tag of the passage which is heard at that position.
+        """
+        if self._by_value is None:
+            self._by_value = sorted((value, i) for i, value in enumerate(self._values))
+        i = bisect_left(self._by_value, (position, -1))
+        if i == len(self._by_value):
+            return None
+        return self._get(self._by_value[i][1])
+
+    # pylint: disable=unused-argument
+    def on_insert_text(self, text_buffer: 'Gtk.TextBuffer', location: 'Gtk.TextIter', text: str, length: int) -> None:
+        """Update the index after text was inserted."""
+        # location was moved to the end of the inserted text
+        end = location.get_offset()
+        start = end - len(text)
+        self._shift(bisect_left(self._starts, start), end - start)
+        self._rescan(start, end)
+
+    # pylint: disable=unused-argument
+    def on_delete_range(self, text_buffer: 'Gtk.TextBuffer', start: 'Gtk.TextIter', end: 'Gtk.TextIter') -> None:
+        """Remember the range which is about to be deleted."""
+        self._deleting = (start.get_offset(), end.get_offset())
+
+    # pylint: disable=unused-argument
+    def on_range_deleted(self, text_buffer: 'Gtk.TextBuffer', start: 'Gtk.TextIter', end: 'Gtk.TextIter') -> None:
+        """Update the index after text was deleted."""
+        assert self._deleting is not None
+        first, last = self._deleting
+        self._deleting = None
+        i = bisect_right(self._ends, first)
+        j = bisect_left(self._starts, last)
+        self._remove(i, j)
+        self._shift(i, first - last)
+        self._rescan(first, first)
+
+    def _shift(self, i: int, delta: int) -> None:
+        """Move all tags starting with the i-th one by delta characters."""
+        for k in range(i, len(self._starts)):
+            self._starts[k] += delta
+            self._ends[k] += delta
+
+    def _remove(self, i: int, j: int) -> None:
+        """Remove the tags i to j - 1."""
+        if i < j:
+            del self._starts[i:j]
+            del self._ends[i:j]
+            del self._values[i:j]
+            self._by_value = None
+
+    def _rescan(self, start: int, end: int) -> None:
+        """Search the lines containing the given range for tags."""
+        start_iter = self.text_buffer.get_iter_at_offset(start)
+        start_iter.set_line_offset(0)
+        end_iter = self.text_buffer.get_iter_at_offset(end)
+        if not end_iter.ends_line():
+            end_iter.forward_to_line_end()
+        first = start_iter.get_offset()
+        last = end_iter.get_offset()
+        i = bisect_right(self._ends, first)
+        self._remove(i, bisect_left(self._starts, last))
+        text = self.text_buffer.get_slice(start_iter, end_iter, True)
+        for match in TIMESTAMP_RE.finditer(text):
+            self._starts.insert(i, first + match.start())
+            self._ends.insert(i, first + match.end())
+            self._values.insert(i, parse_timestamp(match.group(1)))
+            i += 1
+            self._by_value = None
@@ -0,0 +1,170 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Opt-in performance tracing.
+
+Tracing is enabled by setting GTRANSCRIBE_TRACE to a file name. Spans and
+counters are then recorded, a summary is written to stats.json in the cache
+directory every few seconds and the whole timeline is written to the given
+file in Chrome trace format on exit, see chrome://tracing or ui.perfetto.dev.
+Without it, all functions return immediately.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict
+from collections.abc import Iterator
+from gi.repository import GLib
+logger = logging.getLogger('tracing')
+
+# Seconds between updates of the stats file
+STATS_INTERVAL = 5
+# Maximum number of events kept for the timeline, older ones are dropped
+MAX_EVENTS = 200000
+
+enabled = False
+_trace_file: str | None = None
+_stats_file: str | None = None
+_lock = threading.Lock()
+_events: deque[Dict[str, Any]] = deque(maxlen=MAX_EVENTS)
+_counters: Dict[str, int] = {}
+# Per span name: count, total and maximum duration in microseconds
+_spans: Dict[str, list[float]] = {}
+_pid = os.getpid()
+
+
+def enable(trace_file: str, stats_file: str | None = None) -> None:
+    """Start recording, the timeline is written to 'trace_file' by dump()."""
+    global enabled, _trace_file, _stats_file  # pylint: disable=global-statement
+    enabled = True
+    _trace_file = trace_file
+    _stats_file = stats_file
+    if stats_file is not None:
+        GLib.timeout_add_seconds(STATS_INTERVAL, _on_stats_timeout)
+    logger.debug('Tracing to "%s"', trace_file)
+
+
+def enable_from_environment(stats_file: str | None = None) -> None:
+    """Enable tracing if GTRANSCRIBE_TRACE is set."""
+    trace_file = os.environ.get('GTRANSCRIBE_TRACE')
+    if trace_file:
+        enable(trace_file, stats_file)
+
+
+def now() -> float:
+    """Return a timestamp in microseconds, usable as start of a span."""
+    return time.perf_counter_ns() / 1000
+
+
+def start_span() -> float | None:
+    """
+    Return the start of a span which ends in another function.
+
+    Pass the result to finish_span(), None means tracing is disabled.
+    """
+    return now() if enabled else None
+
+
+def finish_span(name: str, start: float | None, **args: Any) -> None:
+    """Record a span started by start_span()."""
+    if start is None or not enabled:
+        return
+    end = now()
+    event = {'name': name, 'ph': 'X', 'ts': start, 'dur': end - start,
+             'pid': _pid, 'tid': threading.get_native_id()}
+    if args:
+        event['args'] = args
+    with _lock:
+        _events.append(event)
+        summary = _spans.setdefault(name, [0, 0.0, 0.0])
+        summary[0] += 1
+        summary[1] += end - start
+        summary[2] = max(summary[2], end - start)
+
+
+@contextmanager
+def span(name: str, **args: Any) -> Iterator[None]:
+    """Record the time spent in the with block."""
+    if not enabled:
+        yield
+        return
+    start = now()
+    try:
+        yield
+    finally:
+        finish_span(name, start, **args)
+
+
+def count(name: str, value: int = 1) -> None:
+    """Add 'value' to the counter 'name'."""
+    if not enabled:
+        return
+    with _lock:
+        total = _counters.get(name, 0) + value
+        _counters[name] = total
+        _events.append({'name': name, 'ph': 'C', 'ts': now(), 'pid': _pid,
+                        'args': {name: total}})
+
+
+def stats() -> Dict[str, Any]:
+    """Return the counters and a summary of the spans in milliseconds."""
+    with _lock:
+        return {
+            'counters': dict(_counters),
+            'spans': {name: {'count': n, 'total_ms': total / 1000,
+                             'mean_ms': total / n / 1000, 'max_ms': longest / 1000}
+                      for name, (n, total, longest) in _spans.items()},
+        }
+
+
+def _write_json(path: str, data: Any) -> None:
+    """Write data to path atomically."""
+    with open(path + '.tmp', 'w', encoding="utf_8") as fout:
+        json.dump(data, fout)
+    os.replace(path + '.tmp', path)
+
+
+def _on_stats_timeout() -> bool:
+    if not enabled or _stats_file is None:
+        return False
+    try:
+        _write_json(_stats_file, stats())
+    except OSError as e:
+        logger.warning('Could not write stats "%s": %s', _stats_file, e)
+        return False
+    return True
+
+
+def dump() -> None:
+    """Write the recorded timeline and the stats."""
+    if not enabled or _trace_file is None:
+        return
+    with _lock:
+        events = list(_events)
+    try:
+        _write_json(_trace_file, {'traceEvents': events,
+                                  'displayTimeUnit': 'ms'})
+        if _stats_file is not None:
+            _write_json(_stats_file, stats())
+    except OSError as e:
+        logger.warning('Could not write trace "%s": %s', _trace_file, e)
+        return
+    logger.debug('Wrote %d trace events to "%s"', len(events), _trace_file)
@@ -0,0 +1,130 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Peak overview of audio files with an on-disk cache."""
+
+import os
+import struct
+import logging
+from array import array
+from collections.abc import Iterable
+from gtranscribe.metadata import cache_dir
+logger = logging.getLogger('waveform')
+
+waveform_dir = os.path.join(cache_dir, "waveforms")
+
+# Sample rate used for the analysis and number of samples per peak of the
+# finest level, i.e. 40 peaks per second
+SAMPLE_RATE = 8000
+BUCKET_SIZE = 200
+# Each level has ZOOM_FACTOR times fewer peaks than the previous one, the
+# coarsest level has at most MIN_PEAKS peaks
+ZOOM_FACTOR = 4
+MIN_PEAKS = 256
+
+# Cache file header: magic, version, sample rate, bucket size, zoom factor
+# and number of levels, each level is stored as peak count followed by the
+# minimum and maximum values as signed bytes
+MAGIC = b'GTPK'
+VERSION = 1
+HEADER = struct.Struct('<4sBIIBB')
+LEVEL_HEADER = struct.Struct('<I')
+
+
+class Waveform():
+    """Minimum and maximum peaks of an audio file at several zoom levels."""
+
+    def __init__(self, mins: array, maxs: array) -> None:
+        self.levels: list[tuple[array, array]] = [(mins, maxs)]
+        while len(mins) > MIN_PEAKS:
+            mins = array('b', (min(mins[i:i + ZOOM_FACTOR])
+                               for i in range(0, len(mins), ZOOM_FACTOR)))
+            maxs = array('b', (max(maxs[i:i + ZOOM_FACTOR])
+                               for i in range(0, len(maxs), ZOOM_FACTOR)))
+            self.levels.append((mins, maxs))
+
+    def level_for(self, width: int) -> tuple[array, array]:
+        """Return the coarsest level with at least 'width' peaks."""
+        for mins, maxs in reversed(self.levels):
+            if len(mins) >= width:
+                return mins, maxs
+        return self.levels[0]
+
+    @classmethod
+    def compute(cls, chunks: Iterable[bytes]) -> 'Waveform':
+        """Compute the peaks of chunks of samples decoded at SAMPLE_RATE."""
+        mins = array('b')
+        maxs = array('b')
+        samples = array('f')
+        for chunk in chunks:
+            samples.frombytes(chunk)
+            end = len(samples) - len(samples) % BUCKET_SIZE
+            for i in range(0, end, BUCKET_SIZE):
+                bucket = samples[i:i + BUCKET_SIZE]
+                mins.append(_quantize(min(bucket)))
+                maxs.append(_quantize(max(bucket)))
+            del samples[:end]
+        if samples:
+            mins.append(_quantize(min(samples)))
+            maxs.append(_quantize(max(samples)))
+        return cls(mins, maxs)
+
+    @classmethod
+    def load(cls, fingerprint: str) -> 'Waveform | None':
+        """Load the cached peaks for the given fingerprint, if any."""
+        path = os.path.join(waveform_dir, fingerprint + '.peaks')
+        try:
+            with open(path, 'rb') as data:
+                magic, version, rate, bucket_size, zoom, n_levels = \
+                    HEADER.unpack(data.read(HEADER.size))
+                if (magic, version, rate, bucket_size, zoom) != \
+                        (MAGIC, VERSION, SAMPLE_RATE, BUCKET_SIZE, ZOOM_FACTOR):
+                    logger.debug('Ignoring outdated cache file "%s"', path)
+                    return None
+                levels = []
+                for _ in range(n_levels):
+                    count, = LEVEL_HEADER.unpack(data.read(LEVEL_HEADER.size))
+                    mins = array('b')
+                    maxs = array('b')
+                    mins.fromfile(data, count)
+                    maxs.fromfile(data, count)
+                    levels.append((mins, maxs))
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, struct.error) as e:
+            logger.warning('Could not read cache file "%s": %s', path, e)
+            return None
+        waveform = cls.__new__(cls)
+        waveform.levels = levels
+        return waveform
+
+    def save(self, fingerprint: str) -> None:
+        """Store the peaks in the cache."""
+        if not os.path.exists(waveform_dir):
+            os.makedirs(waveform_dir)
+        path = os.path.join(waveform_dir, fingerprint + '.peaks')
+        with open(path + '.tmp', 'wb') as data:
+            data.write(HEADER.pack(MAGIC, VERSION, SAMPLE_RATE, BUCKET_SIZE,
+                                   ZOOM_FACTOR, len(self.levels)))
+            for mins, maxs in self.levels:
+                data.write(LEVEL_HEADER.pack(len(mins)))
+                mins.tofile(data)
+                maxs.tofile(data)
+        os.replace(path + '.tmp', path)
+
+
+def _quantize(value: float) -> int:
+    """Map a sample value to a signed byte."""
+    return int(max(-1.0, min(1.0, value)) * 127)
@@ -0,0 +1,46 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Tests for splitting a transcript into passages to export."""
+
+import pytest
+
+pytest.importorskip('gi')
+from gtranscribe.export import passages # NOQA: E402 pylint: disable=wrong-import-position
+
+
+def test_no_timestamps() -> None:
+    assert not passages([], 100)
+
+
+def test_passages() -> None:
+    assert passages([30, 60], 100) == [(0, 30), (30, 60)]
+
+
+def test_timestamps_out_of_order() -> None:
+    assert passages([60, 30], 100) == [(0, 30), (30, 60)]
+
+
+def test_timestamps_at_start_and_end() -> None:
+    # A timestamp at 0 marks an empty passage, one at the end the last one
+    assert passages([0, 50, 100], 100) == [(0, 50), (50, 100)]
+
+
+def test_timestamps_after_the_end() -> None:
+    assert passages([50, 150], 100) == [(0, 50)]
+
+
+def test_duplicate_timestamps() -> None:
+    assert passages([50, 50, 80], 100) == [(0, 50), (50, 80)]
@@ -0,0 +1,92 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Tests for moving meta data stored under md5 hashes to fingerprints."""
+
+import hashlib
+from collections.abc import Iterator
+import pytest
+
+pytest.importorskip('gi')
+# pylint: disable=wrong-import-position
+from gtranscribe import metadata # NOQA: E402
+from gtranscribe.fingerprint import fingerprint_of_file, migrate_legacy # NOQA: E402
+
+
+@pytest.fixture(name='audiofile')
+def fixture_audiofile(tmp_path, monkeypatch) -> Iterator[str]:
+    """Point the meta data module to an empty database, return a file."""
+    monkeypatch.setattr(metadata, 'cache_dir', str(tmp_path))
+    monkeypatch.setattr(metadata, 'database', str(tmp_path / 'metadata.db'))
+    path = tmp_path / 'audio.ogg'
+    path.write_bytes(b'gTranscribe' * 1000)
+    yield str(path)
+    metadata.MetaData.close()
+
+
+def _md5(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def _store(md5: str, position: int | None) -> None:
+    with metadata.transaction() as con:
+        con.execute('INSERT INTO metadata (md5, position) VALUES (?, ?)',
+                    (md5, position))
+
+
+def _position(md5: str) -> int | None:
+    with metadata.transaction() as con:
+        return con.execute('SELECT position FROM metadata WHERE md5=?',
+                           (md5,)).fetchone()[0]
+
+
+def test_migrate_after_open(audiofile: str) -> None:
+    fingerprint = fingerprint_of_file(audiofile)
+    _store(_md5(audiofile), 42)
+    # Opening the file stores a row for the fingerprint first
+    metadata.MetaData(audiofile, fingerprint).store_md5()
+    assert migrate_legacy(audiofile, fingerprint)
+    assert _position(fingerprint) == 42
+    with metadata.transaction() as con:
+        assert con.execute('SELECT path FROM metadata').fetchall() == \
+            [(audiofile,)]
+
+
+def test_no_legacy_rows(audiofile: str) -> None:
+    fingerprint = fingerprint_of_file(audiofile)
+    metadata.MetaData(audiofile, fingerprint).store_md5()
+    assert not migrate_legacy(audiofile, fingerprint)
+    with metadata.transaction() as con:
+        # The file was not hashed
+        assert con.execute("SELECT 1 FROM fingerprints WHERE method='md5'") \
+            .fetchone() is None
+
+
+def test_md5_is_cached(audiofile: str) -> None:
+    _store('d41d8cd98f00b204e9800998ecf8427e', 1)
+    fingerprint = fingerprint_of_file(audiofile)
+    assert not migrate_legacy(audiofile, fingerprint)
+    with metadata.transaction() as con:
+        assert con.execute("SELECT fingerprint FROM fingerprints WHERE method='md5'") \
+            .fetchall() == [(_md5(audiofile),)]
+
+
+def test_own_meta_data_is_kept(audiofile: str) -> None:
+    fingerprint = fingerprint_of_file(audiofile)
+    _store(_md5(audiofile), 42)
+    _store(fingerprint, 7)
+    assert not migrate_legacy(audiofile, fingerprint)
+    assert _position(fingerprint) == 7
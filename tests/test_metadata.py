@@ -0,0 +1,103 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Tests for the schema migrations of the meta data database."""
+
+import sqlite3
+from collections.abc import Iterator
+import pytest
+
+pytest.importorskip('gi')
+from gtranscribe import metadata # NOQA: E402 pylint: disable=wrong-import-position
+
+LATEST = len(metadata.MIGRATIONS)
+
+
+@pytest.fixture(name='database')
+def fixture_database(tmp_path, monkeypatch) -> Iterator[str]:
+    """Point the meta data module to an empty database file."""
+    path = str(tmp_path / 'metadata.db')
+    monkeypatch.setattr(metadata, 'cache_dir', str(tmp_path))
+    monkeypatch.setattr(metadata, 'database', path)
+    yield path
+    metadata.MetaData.close()
+
+
+def _create(path: str, version: int, statements: list[str]) -> None:
+    con = sqlite3.connect(path)
+    for statement in statements:
+        con.execute(statement)
+    con.execute(f'PRAGMA user_version={version}')
+    con.commit()
+    con.close()
+
+
+def _columns(con: sqlite3.Connection, table: str) -> set[str]:
+    return {row[1] for row in con.execute(f'PRAGMA table_info({table})')}
+
+
+def _check_latest(md5: str | None = None) -> None:
+    with metadata.transaction() as con:
+        assert con.execute('PRAGMA user_version').fetchone()[0] == LATEST
+        assert {'loop_start', 'loop_end', 'last_accessed', 'path',
+                'transcript'} <= _columns(con, 'metadata')
+        assert _columns(con, 'bookmarks') == {'md5', 'position', 'name'}
+        if md5 is not None:
+            assert con.execute('SELECT position FROM metadata WHERE md5=?',
+                               (md5,)).fetchone() == (42,)
+
+
+def test_new_database(database: str) -> None:
+    _check_latest()
+
+
+def test_upgrade_unversioned(database: str) -> None:
+    _create(database, 0, [
+        'CREATE TABLE metadata(md5 TEXT PRIMARY KEY, position INTEGER, speed REAL)',
+        "INSERT INTO metadata VALUES ('abc', 42, 1.0)"])
+    _check_latest('abc')
+
+
+def test_upgrade_unversioned_with_loop_column(database: str) -> None:
+    _create(database, 0, [
+        'CREATE TABLE metadata(md5 TEXT PRIMARY KEY, position INTEGER, speed REAL, '
+        'loop_start INTEGER)',
+        "INSERT INTO metadata VALUES ('abc', 42, 1.0, NULL)"])
+    _check_latest('abc')
+
+
+def test_upgrade_version_1(database: str) -> None:
+    _create(database, 1, [
+        'CREATE TABLE metadata(md5 TEXT PRIMARY KEY, position INTEGER, speed REAL, '
+        'loop_start INTEGER, loop_end INTEGER)',
+        "INSERT INTO metadata VALUES ('abc', 42, 1.0, NULL, NULL)"])
+    _check_latest('abc')
+
+
+def test_upgrade_interrupted_version_1(database: str) -> None:
+    # An upgrade which stopped after adding a column of the next version
+    _create(database, 1, [
+        'CREATE TABLE metadata(md5 TEXT PRIMARY KEY, position INTEGER, speed REAL, '
+        'loop_start INTEGER, loop_end INTEGER, last_accessed INTEGER)',
+        "INSERT INTO metadata VALUES ('abc', 42, 1.0, NULL, NULL, NULL)",
+        'CREATE INDEX metadata_last_accessed ON metadata(last_accessed)'])
+    _check_latest('abc')
+
+
+def test_newer_version_is_left_alone(database: str) -> None:
+    _create(database, LATEST + 1, [
+        'CREATE TABLE metadata(md5 TEXT PRIMARY KEY, position INTEGER, speed REAL)'])
+    with metadata.transaction() as con:
+        assert con.execute('PRAGMA user_version').fetchone()[0] == LATEST + 1
@@ -0,0 +1,115 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Tests for splitting audio into utterances and skipping the silence."""
+
+from array import array
+import pytest
+
+pytest.importorskip('gi')
+# pylint: disable=wrong-import-position
+from gtranscribe.speech import FRAME_NS, MIN_PAUSE, MIN_SPEECH, PADDING, \
+    RESTART_GRACE, Speech # NOQA: E402
+
+
+def _speech(*utterances: tuple[int, int]) -> Speech:
+    return Speech(array('q', [start for start, _ in utterances]),
+                  array('q', [end for _, end in utterances]))
+
+
+def _frames(*runs: tuple[bool, int]) -> list[bool]:
+    return [voiced for voiced, count in runs for _ in range(count)]
+
+
+def test_skip_target() -> None:
+    speech = _speech((100, 200), (500, 600))
+    # Silence before the first utterance and between two of them
+    assert speech.skip_target(0) == 100
+    assert speech.skip_target(200) == 500
+    assert speech.skip_target(499) == 500
+    # Within an utterance and behind the last one
+    assert speech.skip_target(100) is None
+    assert speech.skip_target(199) is None
+    assert speech.skip_target(600) is None
+
+
+def test_skip_target_without_utterances() -> None:
+    speech = _speech()
+    assert speech.skip_target(0) is None
+    assert speech.end_of(0) is None
+    assert speech.next_start(0) is None
+    assert speech.previous_start(0) is None
+
+
+def test_end_of() -> None:
+    speech = _speech((0, 200), (500, 600))
+    assert speech.end_of(0) == 200
+    assert speech.end_of(199) == 200
+    assert speech.end_of(200) is None
+    assert speech.end_of(550) == 600
+    assert speech.end_of(600) is None
+
+
+def test_next_and_previous_start() -> None:
+    start = 3 * RESTART_GRACE
+    speech = _speech((0, 10), (start, start + 10))
+    assert speech.next_start(0) == start
+    assert speech.next_start(start) is None
+    # Right after its start, go to the utterance before
+    assert speech.previous_start(start + 1) == 0
+    assert speech.previous_start(start + RESTART_GRACE + 1) == start
+
+
+def test_analyze_empty() -> None:
+    assert len(Speech.analyze(array('f'))) == 0
+
+
+def test_analyze_silence() -> None:
+    assert len(Speech.analyze(array('f', [0.0] * 100))) == 0
+
+
+def test_analyze() -> None:
+    energies = array('f', [0.0] * 100 + [1.0] * 50 + [0.0] * 100)
+    speech = Speech.analyze(energies)
+    assert list(speech.starts) == [(100 - PADDING) * FRAME_NS]
+    assert list(speech.ends) == [(150 + PADDING) * FRAME_NS]
+
+
+def test_from_frames_at_start_and_end() -> None:
+    # Padding is clamped to the recording
+    speech = Speech.from_frames(_frames((True, 10), (False, 50), (True, 10)))
+    assert list(speech.starts) == [0, (60 - PADDING) * FRAME_NS]
+    assert list(speech.ends) == [(10 + PADDING) * FRAME_NS, 70 * FRAME_NS]
+
+
+def test_from_frames_joins_short_pauses() -> None:
+    speech = Speech.from_frames(_frames(
+        (False, 50), (True, 10), (False, MIN_PAUSE - 1), (True, 10), (False, 50)))
+    assert len(speech) == 1
+
+
+def test_from_frames_splits_at_long_pauses() -> None:
+    speech = Speech.from_frames(_frames(
+        (False, 50), (True, 10), (False, MIN_PAUSE), (True, 10), (False, 50)))
+    assert list(speech.starts) == [(50 - PADDING) * FRAME_NS,
+                                   (80 - PADDING) * FRAME_NS]
+    assert list(speech.ends) == [(60 + PADDING) * FRAME_NS,
+                                 (90 + PADDING) * FRAME_NS]
+
+
+def test_from_frames_drops_short_bursts() -> None:
+    speech = Speech.from_frames(_frames(
+        (False, 50), (True, MIN_SPEECH - 1), (False, 50)))
+    assert len(speech) == 0
@@ -0,0 +1,138 @@
+# gTranscribe is a software focused on easy transcription of spoken words.
+# Copyright (C) 2013-2026 Philip Rinn <rinni@inventati.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Tests for parsing timestamp tags and their incremental index."""
+
+import pytest
+
+gi = pytest.importorskip('gi')
+gi.require_version('Gtk', '4.0')
+# pylint: disable=wrong-import-position
+from gi.repository import Gtk # NOQA: E402
+from gtranscribe.timestamps import TIMESTAMP_RE, Timestamp, TimestampIndex, \
+    parse_timestamp # NOQA: E402
+
+SECOND = 1000000000
+
+
+@pytest.mark.parametrize('text, value', [
+    ('00:00', 0),
+    ('02:03', 123 * SECOND),
+    ('02:03.4', 123 * SECOND + 400000000),
+    ('02:03-4', 123 * SECOND + 400000000),
+    ('1:02:03.4', 3723 * SECOND + 400000000),
+    ('01:02:03', 3723 * SECOND),
+])
+def test_parse_timestamp(text: str, value: int) -> None:
+    assert parse_timestamp(text) == value
+
+
+def _scanned(text: str) -> list[Timestamp]:
+    """Return the tags found by searching the whole text."""
+    return [Timestamp(match.start(), match.end(), parse_timestamp(match.group(1)))
+            for match in TIMESTAMP_RE.finditer(text)]
+
+
+def _indexed(index: TimestampIndex) -> list[Timestamp]:
+    # pylint: disable=protected-access
+    return [index._get(i) for i in range(len(index))]
+
+
+def _buffer(text: str) -> tuple[Gtk.TextBuffer, TimestampIndex]:
+    text_buffer = Gtk.TextBuffer()
+    text_buffer.set_text(text)
+    return text_buffer, TimestampIndex(text_buffer)
+
+
+def _text(text_buffer: Gtk.TextBuffer) -> str:
+    return text_buffer.get_text(text_buffer.get_start_iter(),
+                                text_buffer.get_end_iter(), True)
+
+
+def _insert(text_buffer: Gtk.TextBuffer, offset: int, text: str) -> None:
+    text_buffer.insert(text_buffer.get_iter_at_offset(offset), text)
+
+
+def _delete(text_buffer: Gtk.TextBuffer, start: int, end: int) -> None:
+    text_buffer.delete(text_buffer.get_iter_at_offset(start),
+                       text_buffer.get_iter_at_offset(end))
+
+
+def test_empty_buffer() -> None:
+    _, index = _buffer('')
+    assert len(index) == 0
+    assert index.before(0) is None
+    assert index.after(0) is None
+    assert index.last() is None
+    assert index.for_position(0) is None
+    assert index.values() == []
+
+
+def test_tags_at_start_and_end() -> None:
+    text = '[00:00.0] one\ntwo #00:02-5#'
+    _, index = _buffer(text)
+    assert _indexed(index) == _scanned(text)
+    first, last = _indexed(index)
+    assert first.start == 0 and first.value == 0
+    assert last.end == len(text)
+    assert index.before(0) is None
+    assert index.before(first.end) == first
+    assert index.after(0) == last
+    assert index.after(last.start) is None
+    assert index.last() == last
+
+
+def test_for_position() -> None:
+    # Tags are not necessarily in order of their values
+    _, index = _buffer('a [00:05.0] b [00:03.0] c [00:09.0]')
+    assert index.for_position(0).value == 3 * SECOND
+    assert index.for_position(3 * SECOND).value == 3 * SECOND
+    assert index.for_position(4 * SECOND).value == 5 * SECOND
+    assert index.for_position(9 * SECOND + 1) is None
+
+
+def test_insert_shifts_tags() -> None:
+    text_buffer, index = _buffer('[00:01.0] a\n[00:02.0] b')
+    _insert(text_buffer, 0, 'start\n')
+    _insert(text_buffer, len(_text(text_buffer)), ' [00:03.0]')
+    assert _indexed(index) == _scanned(_text(text_buffer))
+    assert index.values() == [SECOND, 2 * SECOND, 3 * SECOND]
+
+
+@pytest.mark.parametrize('start, end', [
+    # Within a tag, across the end of one tag and the start of the next,
+    # across a line break and everything
+    (3, 5), (7, 12), (11, 13), (0, 21),
+])
+def test_delete_overlapping_tags(start: int, end: int) -> None:
+    text_buffer, index = _buffer('[00:01.0] a\n[00:02.0]')
+    _delete(text_buffer, start, end)
+    assert _indexed(index) == _scanned(_text(text_buffer))
+
+
+def test_edits_creating_and_breaking_tags() -> None:
+    text_buffer, index = _buffer('[00:0 1.0] x')
+    assert len(index) == 0
+    # Joining the parts makes a tag
+    _delete(text_buffer, 5, 6)
+    assert _indexed(index) == _scanned(_text(text_buffer))
+    assert index.values() == [SECOND]
+    # Typing into it breaks it again
+    _insert(text_buffer, 3, 'x')
+    assert len(index) == 0
+    # A tag pasted over two lines
+    _insert(text_buffer, 0, '[00:02.0]\n[00:03.0] ')
+    assert _indexed(index) == _scanned(_text(text_buffer))
+    assert index.values() == [2 * SECOND, 3 * SECOND]